@@ -43,7 +43,7 @@ def parser(f):
         ]
         writer.writerow(headers)
         file.readline()
-        for line in file.readlines():
+        for line in file:
             ep = Ep()
             entry = line.split()
 
@@ -126,7 +126,7 @@ def parser(f, f_num, doc_dict, unknown_doc_dict_1, unknown_doc_dict_2):
         if f_num == 0:
             writer.writerow(headers)
         file.readline()
-        for line in file.readlines():
+        for line in file:
             ep = Ep()
             entry = line.split()
 
@@ -4,13 +4,18 @@ Analyzes colonoscopy procedure data and calculates detection rates.
 """
 
 import csv
+import json
+import locale
+import mmap
+import os
 import tkinter as tk
+from array import array
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from tkinter.filedialog import askopenfilename
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import re
 
 
@@ -27,6 +32,7 @@ class Episode:
     sa: str = ""  # Serrated adenoma
     tva: str = ""  # Tubulovillous adenoma
     malig: str = ""  # Malignancy codes
+    codes: Tuple[str, ...] = ()  # Every diagnosis/morphology code (not written to csv)
 
     def to_list(self) -> List[str]:
         """Convert episode to list for CSV writing."""
@@ -119,10 +125,197 @@ class DoctorDictionary:
         return self.by_date_name.get(tertiary_key, ("unknown", "?", "?"))
 
 
+class CodeMatrix:
+    """Every diagnosis and morphology code of every episode, as integers.
+
+    Row i is the i-th episode written to adr.csv. Its codes are
+    code_ids[offsets[i]:offsets[i + 1]], numbers into the codes list, so
+    rows take a few bytes per code. Queries use an inverted index (code ->
+    sorted episode rows) built when first needed, e.g.
+
+        matrix.rows_with(["2M8263/0", "2M8261/0"])    tubulovillous or villous
+        matrix.rows_with(prefix="2M")                  any morphology code
+        matrix.rate(["2M8213/0"])                      (episodes, all episodes)
+
+    The saved file records adr.csv's size and modification time, so a
+    matrix left behind when adr.csv is rewritten (adr1.py, adr3.py) is
+    caught rather than matched to the wrong rows.
+    """
+
+    def __init__(self):
+        self.offsets = array("I", [0])
+        self.code_ids = array("I")
+        self.codes: List[str] = []
+        self.code_numbers: Dict[str, int] = {}
+        self.data_key: Optional[Dict[str, float]] = None
+        self._rows_by_code: Optional[List[array]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def add_row(self, codes: Iterable[str]) -> int:
+        """Add an episode's codes (duplicates kept once). Returns its row number."""
+        seen = set()
+        for code in codes:
+            number = self.code_numbers.get(code)
+            if number is None:
+                number = self.code_numbers[code] = len(self.codes)
+                self.codes.append(code)
+            if number not in seen:
+                seen.add(number)
+                self.code_ids.append(number)
+        self.offsets.append(len(self.code_ids))
+        self._rows_by_code = None
+        return len(self) - 1
+
+    def row_codes(self, row: int) -> List[str]:
+        return [self.codes[n] for n in self.code_ids[self.offsets[row]:self.offsets[row + 1]]]
+
+    def _column_index(self) -> List[array]:
+        if self._rows_by_code is None:
+            self._rows_by_code = [array("I") for _ in self.codes]
+            for row in range(len(self)):
+                for n in self.code_ids[self.offsets[row]:self.offsets[row + 1]]:
+                    self._rows_by_code[n].append(row)
+        return self._rows_by_code
+
+    def rows_with(self, codes: Iterable[str] = (), prefix: str = "") -> Set[int]:
+        """Rows with any of codes, or any code starting with prefix."""
+        wanted = [self.code_numbers[code] for code in codes if code in self.code_numbers]
+        if prefix:
+            wanted += [n for n, code in enumerate(self.codes) if code.startswith(prefix)]
+        index = self._column_index()
+        rows: Set[int] = set()
+        for n in wanted:
+            rows.update(index[n])
+        return rows
+
+    def rate(self, codes: Iterable[str] = (), prefix: str = "",
+             rows: Optional[Set[int]] = None) -> Tuple[int, int]:
+        """(episodes with any of codes or prefix, episodes) among rows (default all)."""
+        found = self.rows_with(codes, prefix)
+        if rows is None:
+            return len(found), len(self)
+        return len(found & rows), len(rows)
+
+    def code_counts(self) -> Dict[str, int]:
+        """Episodes with each code."""
+        return {code: len(rows) for code, rows in zip(self.codes, self._column_index())}
+
+    def save(self, path: str, data_file: Optional[str] = None) -> None:
+        """Save to path, recording data_file (the adr.csv the rows belong to) as it is now."""
+        if data_file is not None:
+            self.data_key = file_key(data_file)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({
+                "data_key": self.data_key,
+                "codes": self.codes,
+                "offsets": self.offsets.tolist(),
+                "code_ids": self.code_ids.tolist(),
+            }, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CodeMatrix":
+        with open(path) as f:
+            saved = json.load(f)
+        matrix = cls()
+        matrix.codes = saved["codes"]
+        matrix.code_numbers = {code: n for n, code in enumerate(matrix.codes)}
+        matrix.offsets = array("I", saved["offsets"])
+        matrix.code_ids = array("I", saved["code_ids"])
+        matrix.data_key = saved.get("data_key")
+        return matrix
+
+    def check(self, data_file: str, rows: Optional[int] = None) -> None:
+        """Raise ValueError if the matrix doesn't belong to data_file as it is now."""
+        if self.data_key is not None and self.data_key != file_key(data_file):
+            raise ValueError(
+                f"{data_file} has changed since its codes were saved - create the datafile again"
+            )
+        if rows is not None and rows != len(self):
+            raise ValueError(f"{data_file} has {rows} rows but its codes have {len(self)}")
+
+
+def file_key(path: str) -> Dict[str, float]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def codes_file_for(data_file: str) -> str:
+    """adr.csv -> adr_codes.json, the CodeMatrix for its rows."""
+    path = Path(data_file)
+    return str(path.with_name(f"{path.stem}_codes.json"))
+
+
+# PHISC files have always been read with the default (locale) encoding -
+# cp1252 on the Windows machine - the same as DoctorDictionary reads
+# episodes.csv, so surnames from both match
+PHISC_ENCODING = locale.getpreferredencoding(False)
+
+
+def decode(field: bytes) -> str:
+    return field.decode(PHISC_ENCODING, "replace")
+
+
+def phisc_lines(file_path: str, needles: Tuple[bytes, ...]) -> Iterator[bytes]:
+    """Lines (as bytes) of a PHISC data file, after the first, containing any of needles.
+
+    The file is memory-mapped and searched for the needles' common prefix, so
+    lines without one are skipped without being split or decoded. Each hit is
+    widened to its line, and the search carries on after that line.
+    """
+    if os.path.getsize(file_path) == 0:
+        return
+    prefix = os.path.commonprefix(needles)
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = mm.find(b"\n") + 1  # skip first line
+        if position == 0:
+            return
+        size = len(mm)
+        while True:
+            hit = mm.find(prefix, position)
+            if hit == -1:
+                return
+            newline = mm.rfind(b"\n", position, hit)
+            line_start = position if newline == -1 else newline + 1
+            line_end = mm.find(b"\n", hit)
+            if line_end == -1:
+                line_end = size
+            line = mm[line_start:line_end]
+            if any(needle in line for needle in needles):
+                yield line
+            position = line_end + 1
+
+
+def code_rate_by_doctor(matrix: CodeMatrix, data_file: str, codes: Iterable[str] = (),
+                        prefix: str = "") -> Dict[str, Tuple[int, int]]:
+    """{doctor: (episodes with the codes, episodes)} using the doctors in data_file.
+
+    Raises ValueError if matrix isn't the one saved with data_file.
+    """
+    matrix.check(data_file)
+    rows_by_doctor: Dict[str, Set[int]] = defaultdict(set)
+    rows = 0
+    with open(data_file, "r") as f:
+        for row, entry in enumerate(csv.DictReader(f)):
+            rows_by_doctor[entry["doc"]].add(row)
+            rows += 1
+    matrix.check(data_file, rows)
+    found = matrix.rows_with(codes, prefix)
+    return {doctor: (len(found & rows), len(rows)) for doctor, rows in rows_by_doctor.items()}
+
+
 class PHISCDataParser:
-    """Parses PHISCData text files and extracts colonoscopy episodes."""
+    """Parses PHISCData text files and extracts colonoscopy episodes.
+
+    Every code of each episode also goes into a CodeMatrix, saved beside
+    the output csv (see codes_file_for).
+    """
     
     PROCEDURE_CODES = {"32090", "32093"}
+    PROCEDURE_NEEDLES = (b"32090", b"32093")
     ADENOMA_CODES = {
         "2M8211/0": "ta",  # Tubular adenoma
         "2M8213/0": "sa",  # Serrated adenoma
@@ -131,44 +324,54 @@ class PHISCDataParser:
     
     def __init__(self, doctor_dict: DoctorDictionary):
         self.doctor_dict = doctor_dict
+        self.matrix = CodeMatrix()
     
     def parse_files(self, file_paths: List[str], output_file: str = "adr.csv") -> None:
         """Parse multiple PHISC data files and write to CSV."""
+        self.matrix = CodeMatrix()
         for idx, file_path in enumerate(file_paths):
             mode = "w" if idx == 0 else "a"
             self._parse_single_file(file_path, output_file, mode, write_header=(idx == 0))
+        self.matrix.save(codes_file_for(output_file), output_file)
     
     def _parse_single_file(self, file_path: str, output_file: str, mode: str, write_header: bool) -> None:
         """Parse a single PHISC data file."""
         headers = ["date", "surname", "mrn", "dob", "doc", "procedure", 
                    "ta", "sa", "tva", "malig"]
         
-        with open(file_path) as infile, open(output_file, mode) as outfile:
+        with open(output_file, mode) as outfile:
             writer = csv.writer(outfile)
             if write_header:
                 writer.writerow(headers)
             
-            infile.readline()  # Skip first line
-            for line in infile:
+            for line in phisc_lines(file_path, self.PROCEDURE_NEEDLES):
                 episode = self._parse_line(line)
                 if episode:
                     writer.writerow(episode.to_list())
+                    self.matrix.add_row(episode.codes)
     
-    def _parse_line(self, line: str) -> Episode:
-        """Parse a single line from PHISC data file."""
+    def _parse_line(self, line: bytes) -> Optional[Episode]:
+        """Parse a single line (bytes) from PHISC data file.
+
+        Only the fields used are decoded.
+        """
         entry = line.split()
+        if len(entry) < 3:
+            return None
         procedure_codes = entry[-2]
         
         # Check if line contains relevant procedure codes
-        relevant_code = next((code for code in self.PROCEDURE_CODES if code in procedure_codes), None)
+        relevant_code = next(
+            (code for code in self.PROCEDURE_CODES if code.encode() in procedure_codes), None
+        )
         if not relevant_code:
             return None
         
-        episode = Episode(procedure=relevant_code, surname=entry[2].lower())
+        episode = Episode(procedure=relevant_code, surname=decode(entry[2]).lower())
         
         # Find ICD codes starting point (04 or 04G prefix)
         icd_index = next(
-            (i for i, item in enumerate(entry) if item == "04" or item.startswith("04G")),
+            (i for i, item in enumerate(entry) if item == b"04" or item.startswith(b"04G")),
             -1
         )
         
@@ -176,19 +379,30 @@ class PHISCDataParser:
             return None
         
         # Extract date and DOB
-        episode.date = entry[icd_index - 2][:8]
-        digits_only = re.sub(r"[^0-9]", "", entry[icd_index - 3])
-        episode.dob = digits_only[4:12]
+        episode.date = decode(entry[icd_index - 2][:8])
+        digits_only = re.sub(rb"[^0-9]", b"", entry[icd_index - 3])
+        episode.dob = decode(digits_only[4:12])
         
-        # Parse ICD codes for adenomas (only for procedure 32093)
+        # Every code for the CodeMatrix; adenomas only for procedure 32093
+        episode.codes = self._all_codes(entry, icd_index + 1)
         if episode.procedure == "32093":
-            self._parse_icd_codes(entry, icd_index + 1, episode)
+            self._parse_icd_codes(episode.codes, 0, episode)
         
         # Lookup doctor information
         self._lookup_doctor_info(episode)
         
         return episode
     
+    @staticmethod
+    def _all_codes(entry: List[bytes], start_idx: int) -> List[str]:
+        """Diagnosis and morphology codes from start_idx up to the "2" that ends them."""
+        codes = []
+        for code in entry[start_idx:]:
+            if code == b"2":
+                break
+            codes.append(decode(code))
+        return codes
+
     def _parse_icd_codes(self, entry: List[str], start_idx: int, episode: Episode) -> None:
         """Parse ICD codes starting from given index."""
         i = start_idx
@@ -0,0 +1,159 @@
+"""
+Surveillance interval compliance after adenomas found at colonoscopy.
+
+For every colonoscopy in adr.csv that found an adenoma, find the patient's
+next colonoscopy and compare the interval with the guideline interval for
+the adenoma type (the shortest, if more than one type was found):
+    tva, sa    3 years
+    ta         5 years
+A follow-up within TOLERANCE_DAYS of the guideline is on time; sooner is
+early, later is late. Colonoscopies within REPEAT_DAYS of the index one are
+repeats (see repeat_procedures), not surveillance, and are skipped.
+
+Each patient's colonoscopy days from adr.csv and episodes.csv are gathered
+once into a sorted list, so the next colonoscopy is a bisect.
+
+    python surveillance.py
+"""
+import csv
+import sys
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dec_dates import day_ordinal  # noqa: E402
+
+adr_file = "adr.csv"
+episodes_file = "episodes.csv"
+report_file = "surveillance.txt"
+
+GUIDELINE_YEARS = {"tva": 3, "sa": 3, "ta": 5}
+TOLERANCE_DAYS = 183
+REPEAT_DAYS = 31
+OUTCOMES = ["on_time", "early", "late", "overdue", "not_due"]
+
+
+def adr_day(ddmmyyyy):
+    """ddmmyyyy (adr.csv) -> day number."""
+    return date(int(ddmmyyyy[4:8]), int(ddmmyyyy[2:4]), int(ddmmyyyy[0:2])).toordinal()
+
+
+def guideline_days(adr_row):
+    """Guideline interval in days for the adenomas in an adr.csv row, or None."""
+    years = [GUIDELINE_YEARS[kind] for kind in GUIDELINE_YEARS if adr_row[kind]]
+    if not years:
+        return None
+    return round(min(years) * 365.25)
+
+
+def colonoscopy_index(adr_rows, episodes_path=episodes_file):
+    """mrn -> sorted, distinct colonoscopy days from adr.csv and episodes.csv."""
+    days = defaultdict(set)
+    for row in adr_rows:
+        if row["mrn"] not in ("", "?"):
+            days[row["mrn"]].add(adr_day(row["date"]))
+    with open(episodes_path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["colon"].strip():
+                try:
+                    days[row["mrn"]].add(day_ordinal(row["date"]))
+                except ValueError:
+                    continue
+    return {mrn: sorted(mrn_days) for mrn, mrn_days in days.items()}
+
+
+def classify(index_day, guideline, later_days, today):
+    """Outcome and interval (days, or None) for one adenoma colonoscopy.
+
+    later_days are the patient's colonoscopy days, sorted.
+    """
+    position = bisect_right(later_days, index_day + REPEAT_DAYS)
+    if position == len(later_days):
+        if today - index_day > guideline + TOLERANCE_DAYS:
+            return "overdue", None
+        return "not_due", None
+    interval = later_days[position] - index_day
+    if interval < guideline - TOLERANCE_DAYS:
+        return "early", interval
+    if interval > guideline + TOLERANCE_DAYS:
+        return "late", interval
+    return "on_time", interval
+
+
+def compliance(adr_path=adr_file, episodes_path=episodes_file, today=None):
+    """{doctor: {outcome: count}} for the adenoma colonoscopies in adr.csv, and
+    a list of (date, mrn, doctor, outcome, interval) cases."""
+    today = today or date.today().toordinal()
+    with open(adr_path, newline="") as f:
+        adr_rows = list(csv.DictReader(f))
+    index = colonoscopy_index(adr_rows, episodes_path)
+
+    results = defaultdict(lambda: dict.fromkeys(OUTCOMES, 0))
+    cases = []
+    seen = set()
+    for row in adr_rows:
+        guideline = guideline_days(row)
+        key = (row["date"], row["mrn"])
+        if guideline is None or row["mrn"] in ("", "?") or key in seen:
+            continue
+        seen.add(key)
+        outcome, interval = classify(adr_day(row["date"]), guideline, index[row["mrn"]], today)
+        results[row["doc"]][outcome] += 1
+        cases.append((row["date"], row["mrn"], row["doc"], outcome, interval))
+    return results, cases
+
+
+def rate(part, whole):
+    return f"{round(part / whole * 100)}%" if whole else "-"
+
+
+def report_lines(results, cases):
+    lines = [
+        "SURVEILLANCE AFTER ADENOMA (TVA/SA 3 YEARS, TA 5 YEARS, "
+        f"+/- {TOLERANCE_DAYS} DAYS)",
+        "",
+        "Doctor".ljust(20) + "Followed".ljust(10) + "On time".ljust(10) + "Early".ljust(10)
+        + "Late".ljust(10) + "Overdue".ljust(10) + "Not due",
+    ]
+    totals = dict.fromkeys(OUTCOMES, 0)
+    for doctor in sorted(results):
+        counts = results[doctor]
+        for outcome in OUTCOMES:
+            totals[outcome] += counts[outcome]
+        lines.append(outcome_line(doctor.title(), counts))
+    lines += ["", outcome_line("All", totals), ""]
+    lines.append("Early and late are % of patients followed up; overdue is the number")
+    lines.append("past the guideline interval with no colonoscopy here yet.")
+    lines += ["", "EARLY AND LATE FOLLOW-UPS", ""]
+    for date_str, mrn, doctor, outcome, interval in cases:
+        if outcome in ("early", "late"):
+            lines.append(
+                f"{date_str.ljust(10)}{mrn.ljust(10)}{doctor.title().ljust(20)}"
+                f"{outcome.ljust(8)}{interval / 365.25:.1f} years"
+            )
+    return lines
+
+
+def outcome_line(label, counts):
+    followed = counts["on_time"] + counts["early"] + counts["late"]
+    return (
+        label.ljust(20)
+        + str(followed).ljust(10)
+        + rate(counts["on_time"], followed).ljust(10)
+        + rate(counts["early"], followed).ljust(10)
+        + rate(counts["late"], followed).ljust(10)
+        + str(counts["overdue"]).ljust(10)
+        + str(counts["not_due"])
+    )
+
+
+if __name__ == "__main__":
+    results, cases = compliance()
+    lines = report_lines(results, cases)
+    with open(report_file, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    print("\n".join(lines[:3 + len(results) + 2]))
+    print(f"Report written to {report_file}")
@@ -0,0 +1,82 @@
+import csv
+
+import pytest
+
+pytest.importorskip("tkinter")  # adr_refactor is a Tk app
+
+from adr_refactor import (  # noqa: E402
+    CodeMatrix,
+    DoctorDictionary,
+    PHISCDataParser,
+    code_rate_by_doctor,
+    codes_file_for,
+)
+
+EPISODE_HEADERS = [
+    "date", "mrn", "in", "out", "anaes", "endo", "asa", "upper", "colon", "anal",
+    "nurse", "clips", "p_recall", "c_recall", "caecum", "title", "firstname",
+    "surname", "dob", "email", "consult", "polyp",
+]
+
+
+# One PHISC line: surname is the third field, the date two fields before the
+# 04 that starts the codes, the procedure second last
+def phisc_line(surname, codes, procedure):
+    return (
+        f"03720C38400001731812213726619 10000000000000Joseph {surname} 17 50 Carr Street "
+        "COOGEE NSW203409041958111011201430052025140021207 3005202518003001 "
+        f"00000020000099 04 {' '.join(codes)} 2 {procedure}001300520253047301192515291 21"
+    )
+
+
+def write_test_files(tmp_path):
+    phisc = tmp_path / "phisc.txt"
+    phisc.write_text("\n".join([
+        "header",
+        phisc_line("NAME0", ["2M8211/0"], "32093"),
+        phisc_line("NAME1", ["2Z8643", "2M8213/0", "D120"], "32093"),
+        phisc_line("NAME2", ["K573"], "32090"),
+        phisc_line("NAME3", ["2M8211/0"], "30473"),  # not a colonoscopy
+    ]) + "\n")
+    episodes = tmp_path / "episodes.csv"
+    with open(episodes, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=EPISODE_HEADERS)
+        writer.writeheader()
+        for mrn, endo in [("0", "Dr A"), ("1", "Dr A"), ("2", "Dr B")]:
+            full_row = {field: "" for field in EPISODE_HEADERS}
+            full_row.update(date="30-05-2025", mrn=mrn, endo=endo, surname=f"name{mrn}", dob="04/09/1958")
+            writer.writerow(full_row)
+    return phisc, episodes
+
+
+def test_code_matrix_saved_with_datafile(tmp_path):
+    phisc, episodes = write_test_files(tmp_path)
+    adr_csv = str(tmp_path / "adr.csv")
+    PHISCDataParser(DoctorDictionary(str(episodes))).parse_files([str(phisc)], adr_csv)
+
+    matrix = CodeMatrix.load(codes_file_for(adr_csv))
+    assert codes_file_for(adr_csv).endswith("adr_codes.json")
+    assert len(matrix) == 3
+    assert matrix.rows_with(["2M8211/0", "2M8213/0"]) == {0, 1}
+    assert matrix.rows_with(prefix="2M") == {0, 1}
+    assert matrix.rate(["K573"]) == (1, 3)
+    assert code_rate_by_doctor(matrix, adr_csv, prefix="2M") == {
+        "dr a": (2, 2),
+        "dr b": (0, 1),
+    }
+
+
+def test_check_refuses_rewritten_datafile(tmp_path):
+    """A matrix left behind when adr.csv is written again isn't used."""
+    phisc, episodes = write_test_files(tmp_path)
+    adr_csv = tmp_path / "adr.csv"
+    PHISCDataParser(DoctorDictionary(str(episodes))).parse_files([str(phisc)], str(adr_csv))
+    matrix = CodeMatrix.load(codes_file_for(str(adr_csv)))
+    matrix.check(str(adr_csv))
+
+    lines = adr_csv.read_text().splitlines()
+    adr_csv.write_text("\n".join(lines[:-1]) + "\n")
+    with pytest.raises(ValueError):
+        matrix.check(str(adr_csv))
+    with pytest.raises(ValueError):
+        code_rate_by_doctor(matrix, str(adr_csv), prefix="2M")
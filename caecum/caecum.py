@@ -2,6 +2,7 @@ import csv
 import os
 import platform
 import subprocess
+import sys
 from collections import defaultdict
 from pathlib import Path
 
@@ -14,15 +15,28 @@ month_dict = {
 
 
 def suc_fail_template():
-    return {"success": 0, "fail": 0, "total": 0, "poor_prep": 0}
+    return {"success": 0, "fail": 0, "total": 0, "poor_prep": 0, "obstruction": 0}
 
 
-def log_doc_caecum(results, doctor, outcome, poor_prep=False):
+def quarter_template():
+    return {
+        "results": defaultdict(suc_fail_template),
+        "total_colons": 0,
+        "bad_bowel_preps": 0,
+        "obstructions": 0,
+        "failure_reach_caecum": 0,
+        "failures": [],
+    }
+
+
+def log_doc_caecum(results, doctor, outcome, poor_prep=False, obstruction=False):
     """Record a colonoscopy result for a doctor."""
     results[doctor][outcome] += 1
     results[doctor]["total"] += 1
     if poor_prep:
         results[doctor]["poor_prep"] += 1
+    if obstruction:
+        results[doctor]["obstruction"] += 1
 
 
 if platform.system() == "Windows":
@@ -33,11 +47,21 @@ else:
     code_base = Path(".")
 data_file = data_base / "episodes.csv"
 qps_address = code_base / "caecum_qps.txt"
+trend_address = code_base / "caecum_trend.txt"
+
 
+def quarter_end(month):
+    """Return the last month (3, 6, 9 or 12) of the quarter a month is in."""
+    return (month - 1) // 3 * 3 + 3
 
-def dates_finder(month):
-    """Return list of month strings (with leading zeros) for the quarter."""
-    return [f"{m:02d}" for m in [month, month - 1, month - 2]]
+
+def quarters_between(first_year, last_year):
+    """Every (year, month) quarter from first_year to last_year inclusive."""
+    return [
+        (str(year), month)
+        for year in range(int(first_year), int(last_year) + 1)
+        for month in month_dict
+    ]
 
 
 def format_doctor_line(doctor, stats):
@@ -48,22 +72,20 @@ def format_doctor_line(doctor, stats):
     return f"{doctor.ljust(20)}:               {str(total).ljust(8)}   {str(poor_prep).ljust(8)} {str(other_fails).ljust(8)}"
 
 
-def process_csv_data(year, month):
-    """Read the CSV file and return statistics for the quarter.
+def process_csv_periods(periods=None):
+    """Read the CSV file once and return statistics for many quarters.
 
-    Returns a dictionary with:
-        results: per-doctor statistics
-        total_colons: total number of colonoscopies
-        bad_bowel_preps: count of poor prep cases
-        failure_reach_caecum: failures minus obstructions (for QPS)
-        failures: list of individual failure cases
+    Every colonoscopy is bucketed by (year, quarter end month) in a single
+    pass. periods is a list of (year, month) to keep - None keeps them all.
+    Returns {(year, month): statistics} with the same statistics as
+    process_csv_data, plus an obstructions count. Requested quarters with no
+    colonoscopies get an empty bucket.
     """
-    results = defaultdict(suc_fail_template)
-    month_set = dates_finder(month)
-    total_colons = 0
-    bad_bowel_preps = 0
-    failures = []
-    failure_reach_caecum = 0
+    buckets = defaultdict(quarter_template)
+    if periods is not None:
+        wanted = set(periods)
+        for period in wanted:
+            buckets[period]
 
     with open(data_file) as file:
         reader = csv.DictReader(file)
@@ -76,40 +98,81 @@ def process_csv_data(year, month):
             # Parse date in DD-MM-YYYY format
             date_str = row['date']
             date_parts = date_str.split('-')
-            row_year = date_parts[2]  # Year is at end
-            row_month = date_parts[1]  # Month is in middle
+            period = (date_parts[2], quarter_end(int(date_parts[1])))
+            if periods is not None and period not in wanted:
+                continue
 
-            if row_year == year and row_month in month_set:
-                total_colons += 1
+            data = buckets[period]
+            data["total_colons"] += 1
 
-                # Determine success/fail from caecum column
-                if caecum_value == "success":
-                    outcome = "success"
-                    reason = ""
-                else:
-                    outcome = "fail"
-                    reason = caecum_value
+            # Determine success/fail from caecum column
+            if caecum_value == "success":
+                outcome = "success"
+                reason = ""
+            else:
+                outcome = "fail"
+                reason = caecum_value
 
-                if reason == "Poor Prep":
-                    log_doc_caecum(results, row['endo'], outcome, poor_prep=True)
-                    bad_bowel_preps += 1
-                else:
-                    log_doc_caecum(results, row['endo'], outcome)
+            poor_prep = reason == "Poor Prep"
+            obstruction = reason == "Obstruction"
+            log_doc_caecum(data["results"], row['endo'], outcome,
+                           poor_prep=poor_prep, obstruction=obstruction)
+            if poor_prep:
+                data["bad_bowel_preps"] += 1
+            if obstruction:
+                data["obstructions"] += 1
 
-                if outcome == "fail" and reason != "Obstruction":
-                    failure_reach_caecum += 1
+            if outcome == "fail" and not obstruction:
+                data["failure_reach_caecum"] += 1
 
-                if outcome == "fail":
-                    case = (date_str, row['endo'], row['mrn'], reason)
-                    failures.append(case)
+            if outcome == "fail":
+                case = (date_str, row['endo'], row['mrn'], reason)
+                data["failures"].append(case)
+
+    return dict(buckets)
+
+
+def process_csv_data(year, month):
+    """Read the CSV file and return statistics for the quarter.
+
+    Returns a dictionary with:
+        results: per-doctor statistics
+        total_colons: total number of colonoscopies
+        bad_bowel_preps: count of poor prep cases
+        obstructions: count of failures due to obstruction
+        failure_reach_caecum: failures minus obstructions (for QPS)
+        failures: list of individual failure cases
+    """
+    return process_csv_periods([(year, month)])[(year, month)]
 
-    return {
-        "results": results,
-        "total_colons": total_colons,
-        "bad_bowel_preps": bad_bowel_preps,
-        "failure_reach_caecum": failure_reach_caecum,
-        "failures": failures,
-    }
+
+def intubation_rate(stats):
+    """Caecal intubation rate as a percentage, obstructions excluded."""
+    attempted = stats["total"] - stats["obstruction"]
+    if attempted == 0:
+        return -1
+    return round((stats["success"] / attempted) * 100)
+
+
+def write_trend_report(buckets, address=trend_address):
+    """Write a doctor x quarter table of caecal intubation rates."""
+    periods = sorted(buckets, key=lambda period: (period[0], period[1]))
+    doctors = sorted({doctor for period in periods for doctor in buckets[period]["results"]})
+    labels = [f"{year} Q{month // 3}" for year, month in periods]
+
+    with open(address, "w") as file:
+        file.write("CAECAL INTUBATION RATE (%) BY QUARTER - OBSTRUCTIONS EXCLUDED\n\n\n")
+        file.write("Doctor".ljust(20) + "".join(label.ljust(10) for label in labels) + "\n\n")
+        for doctor in doctors:
+            cells = []
+            for period in periods:
+                stats = buckets[period]["results"].get(doctor)
+                cells.append("-" if stats is None else str(intubation_rate(stats)))
+            file.write(doctor.ljust(20) + "".join(cell.ljust(10) for cell in cells) + "\n")
+
+        file.write("\n" + "Total colons".ljust(20))
+        file.write("".join(str(buckets[period]["total_colons"]).ljust(10) for period in periods))
+        file.write("\n")
 
 
 def print_results(year, month, data):
@@ -130,9 +193,9 @@ def print_results(year, month, data):
         print(format_doctor_line(doctor, stats))
 
 
-def write_report(year, month, data):
+def write_report(year, month, data, address=qps_address):
     """Write the full report to a file."""
-    with open(qps_address, "w") as file:
+    with open(address, "w") as file:
         # QPS section
         file.write(f"""QPS CAECUM DATA FOR {month_dict[month]} {year}
 
@@ -175,6 +238,20 @@ def main(year, month):
     open_report()
 
 
+def main_many(periods, out_dir=code_base):
+    """Write a report for every quarter in periods, plus the trend table.
+
+    All quarters come from a single read of episodes.csv. Quarters with no
+    colonoscopies are skipped.
+    """
+    buckets = process_csv_periods(periods)
+    buckets = {period: data for period, data in buckets.items() if data["total_colons"]}
+    for (year, month), data in sorted(buckets.items()):
+        write_report(year, month, data, Path(out_dir) / f"caecum_qps_{year}_{month:02d}.txt")
+        print(f"{month_dict[month]} {year}:  {data['total_colons']} colons")
+    write_trend_report(buckets, Path(out_dir) / "caecum_trend.txt")
+
+
 def intro():
     while True:
         year = input("Year as 4 digits:  ")
@@ -192,5 +269,9 @@ def intro():
 
 
 if __name__ == "__main__":
-    year, month = intro()
-    main(year, month)
+    if len(sys.argv) == 3:
+        # caecum.py FIRST_YEAR LAST_YEAR - every quarter plus the trend table
+        main_many(quarters_between(sys.argv[1], sys.argv[2]))
+    else:
+        year, month = intro()
+        main(year, month)
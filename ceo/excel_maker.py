@@ -2,140 +2,284 @@ import tkinter as tk
 from tkinter import messagebox
 from tkcalendar import DateEntry
 import csv
+import mmap
 import os
+import sys
+import tempfile
 from datetime import datetime
+from pathlib import Path
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def extract_episodes():
-    """Extract episodes for selected date and create Excel file"""
-    selected_date = cal.get_date()
+from dec_dates import day_ordinal  # noqa: E402
+
+CSV_FILE = "episodes.csv"
+COLUMNS = ["upper", "lower", "anal", "polyp"]
+MAX_WIDTH = 50
+
+
+class SheetSpool:
+    """Rows for one sheet, spooled to a temporary file while widths are measured.
+
+    A write-only worksheet needs its column widths before the first row is
+    written, so rows are held on disk (not in memory) until the sheet is done.
+    """
+
+    def __init__(self, title, headers):
+        self.title = title
+        self.headers = headers
+        self.widths = [len(header) for header in headers]
+        self.count = 0
+        self.file = tempfile.TemporaryFile("w+", newline="")
+        self.writer = csv.writer(self.file)
+
+    def add(self, values):
+        self.writer.writerow(values)
+        for i, value in enumerate(values):
+            if len(value) > self.widths[i]:
+                self.widths[i] = len(value)
+        self.count += 1
+
+    def write_to(self, wb):
+        """Stream the spooled rows into a new sheet of a write-only workbook."""
+        ws = wb.create_sheet(self.title)
+        for i, width in enumerate(self.widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_WIDTH)
+
+        header_row = []
+        for header in self.headers:
+            cell = WriteOnlyCell(ws, value=header.upper())
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal="center")
+            header_row.append(cell)
+        ws.append(header_row)
+
+        self.file.seek(0)
+        for values in csv.reader(self.file):
+            ws.append(values)
+        self.file.close()
+
+
+def line_day(mm, line_start):
+    """Day number of the date at the start of the line beginning at line_start.
+
+    A blank line (only expected at the end of the file) sorts after every date.
+    """
+    date_bytes = mm[line_start:line_start + 10]
+    if date_bytes[:1] in (b"", b"\r", b"\n"):
+        return float("inf")
+    return day_ordinal(date_bytes.decode("ascii"))
+
+
+def seek_date(mm, data_start, day):
+    """Byte offset of the first line dated on or after day.
+
+    episodes.csv is in date order, so this is a binary search over byte
+    offsets: each probe backs up to the start of its line and reads the date.
+    Lines starting before lo are all earlier than day; the line at hi is not.
+    """
+    lo, hi = data_start, len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = max(mm.rfind(b"\n", lo, mid) + 1, lo)
+        if line_day(mm, line_start) < day:
+            line_end = mm.find(b"\n", line_start)
+            lo = len(mm) if line_end == -1 else line_end + 1
+        else:
+            hi = line_start
+    return lo
+
+
+def rows_in_range(csv_file, start, end):
+    """Yield (date string, row) for episodes from start to end (dates) inclusive.
+
+    Memory-maps episodes.csv and binary searches for the first line of start,
+    then reads forward until the first later date, so the time taken doesn't
+    depend on how many years of history come before.
+    """
+    if os.path.getsize(csv_file) == 0:
+        return
+    end_day = end.toordinal()
+    with open(csv_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = mm.find(b"\n") + 1
+        if header_end == 0:
+            return
+        fieldnames = next(csv.reader([mm[:header_end].decode("utf-8")]))
+        offset = seek_date(mm, header_end, start.toordinal())
 
-    # Convert date to dd-mm-yyyy format to match CSV
-    date_str = selected_date.strftime("%d-%m-%Y")
+        def lines():
+            position = offset
+            while position < len(mm):
+                line_end = mm.find(b"\n", position)
+                line_end = len(mm) if line_end == -1 else line_end + 1
+                if line_day(mm, position) > end_day:
+                    return
+                yield mm[position:line_end].decode("utf-8")
+                position = line_end
 
-    # Read CSV and filter rows
-    matching_rows = []
-    csv_file = "episodes.csv"
+        for row in csv.DictReader(lines(), fieldnames=fieldnames):
+            yield row["date"], row
 
-    if not os.path.exists(csv_file):
-        messagebox.showerror("Error", f"File {csv_file} not found!")
+
+def export_range(csv_file, start, end, output_filename, per_day=True):
+    """Write episodes from start to end to an xlsx file.
+
+    per_day gives one sheet per date; otherwise one "Episodes" sheet with the
+    date in the first column. Rows are streamed, so memory use doesn't grow
+    with the length of the range. Returns the number of episodes written
+    (nothing is saved if there are none).
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    combined = None if per_day else SheetSpool("Episodes", ["date"] + COLUMNS)
+    day_sheet = None
+    total = 0
+
+    for date_str, row in rows_in_range(csv_file, start, end):
+        values = [row[column] for column in COLUMNS]
+        if per_day:
+            if day_sheet is None or day_sheet.title != date_str:
+                if day_sheet is not None:
+                    day_sheet.write_to(wb)
+                day_sheet = SheetSpool(date_str, COLUMNS)
+            day_sheet.add(values)
+        else:
+            combined.add([date_str] + values)
+        total += 1
+
+    last_sheet = day_sheet if per_day else combined
+    if total:
+        last_sheet.write_to(wb)
+        wb.save(output_filename)
+    elif last_sheet is not None:
+        last_sheet.file.close()
+    return total
+
+
+def export_single_day(csv_file, selected_date, output_filename):
+    """One day's episodes without the date column, as the original export."""
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = SheetSpool("Episodes", COLUMNS)
+    for date_str, row in rows_in_range(csv_file, selected_date, selected_date):
+        sheet.add([row[column] for column in COLUMNS])
+    if sheet.count:
+        sheet.write_to(wb)
+        wb.save(output_filename)
+    else:
+        sheet.file.close()
+    return sheet.count
+
+
+def extract_episodes():
+    """Extract episodes for the selected dates and create Excel file"""
+    start = cal.get_date()
+    end = cal_to.get_date()
+    if end < start:
+        messagebox.showerror("Error", "The 'To' date is before the 'From' date.")
+        return
+
+    if not os.path.exists(CSV_FILE):
+        messagebox.showerror("Error", f"File {CSV_FILE} not found!")
         return
 
     try:
-        with open(csv_file, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["date"] == date_str:
-                    matching_rows.append(row)
+        if start == end:
+            # A single day keeps the original file name and layout
+            date_label = start.strftime("%d-%m-%Y")
+            output_filename = f"{start.strftime('%Y-%m-%d')}.xlsx"
+            count = export_single_day(CSV_FILE, start, output_filename)
+        else:
+            date_label = f"{start.strftime('%d-%m-%Y')} to {end.strftime('%d-%m-%Y')}"
+            output_filename = f"{start.strftime('%Y-%m-%d')}_to_{end.strftime('%Y-%m-%d')}.xlsx"
+            per_day = sheet_var.get() == "per_day"
+            count = export_range(CSV_FILE, start, end, output_filename, per_day)
     except Exception as e:
-        messagebox.showerror("Error", f"Error reading CSV: {str(e)}")
+        messagebox.showerror("Error", f"Error creating Excel file: {str(e)}")
         return
 
     # Check if any rows found
-    if not matching_rows:
-        messagebox.showinfo("No Data", f"No episodes found for {date_str}")
+    if not count:
+        messagebox.showinfo("No Data", f"No episodes found for {date_label}")
         return
 
-    # Create Excel file
-    output_filename = f"{selected_date.strftime('%Y-%m-%d')}.xlsx"
+    messagebox.showinfo(
+        "Success",
+        f"Created {output_filename}\n{count} episodes exported",
+    )
 
-    try:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Episodes"
-
-        # Write headers
-        headers = ["upper", "lower", "anal", "polyp"]
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header.upper())
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
+    # Open the file
+    os.startfile(output_filename)
 
-        # Write data rows
-        for row_num, row_data in enumerate(matching_rows, 2):
-            ws.cell(row=row_num, column=1, value=row_data["upper"])
-            ws.cell(row=row_num, column=2, value=row_data["lower"])
-            ws.cell(row=row_num, column=3, value=row_data["anal"])
-            ws.cell(row=row_num, column=4, value=row_data["polyp"])
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Save workbook
-        wb.save(output_filename)
+    # Close the application
+    root.destroy()
 
-        messagebox.showinfo(
-            "Success",
-            f"Created {output_filename}\n{len(matching_rows)} episodes exported",
-        )
 
-        # Open the file
-        os.startfile(output_filename)
+if __name__ == "__main__":
+    # Create main window
+    root = tk.Tk()
+    root.title("Episode Extractor")
+    root.geometry("350x330")
+    root.resizable(False, False)
 
-        # Close the application
-        root.destroy()
+    # Create and pack widgets
+    title_label = tk.Label(
+        root, text="Select Dates to Extract Episodes", font=("Arial", 12, "bold")
+    )
+    title_label.pack(pady=(20, 10))
 
-    except Exception as e:
-        messagebox.showerror("Error", f"Error creating Excel file: {str(e)}")
+    # Date pickers - leave To on the same day for a single-day export
+    date_frame = tk.Frame(root)
+    date_frame.pack(pady=5)
+    date_options = dict(
+        width=12,
+        background="darkblue",
+        foreground="white",
+        borderwidth=2,
+        date_pattern="dd-mm-yyyy",
+        font=("Arial", 11),
+    )
+    tk.Label(date_frame, text="From", font=("Arial", 10)).grid(row=0, column=0, padx=5, pady=5)
+    cal = DateEntry(date_frame, **date_options)
+    cal.grid(row=0, column=1, padx=5, pady=5)
+    tk.Label(date_frame, text="To", font=("Arial", 10)).grid(row=1, column=0, padx=5, pady=5)
+    cal_to = DateEntry(date_frame, **date_options)
+    cal_to.grid(row=1, column=1, padx=5, pady=5)
+
+    # Layout for ranges longer than a day
+    sheet_var = tk.StringVar(value="per_day")
+    sheet_frame = tk.Frame(root)
+    sheet_frame.pack(pady=5)
+    tk.Radiobutton(
+        sheet_frame, text="One sheet per day", variable=sheet_var, value="per_day"
+    ).pack(side="left", padx=5)
+    tk.Radiobutton(
+        sheet_frame, text="One combined sheet", variable=sheet_var, value="combined"
+    ).pack(side="left", padx=5)
+
+    # Extract button
+    extract_btn = tk.Button(
+        root,
+        text="Extract to Excel",
+        command=extract_episodes,
+        font=("Arial", 10),
+        bg="#4CAF50",
+        fg="white",
+        padx=20,
+        pady=10,
+        cursor="hand2",
+    )
+    extract_btn.pack(pady=20)
 
+    # Center window on screen
+    root.update_idletasks()
+    width = root.winfo_width()
+    height = root.winfo_height()
+    x = (root.winfo_screenwidth() // 2) - (width // 2)
+    y = (root.winfo_screenheight() // 2) - (height // 2)
+    root.geometry(f"{width}x{height}+{x}+{y}")
 
-# Create main window
-root = tk.Tk()
-root.title("Episode Extractor")
-root.geometry("350x200")
-root.resizable(False, False)
-
-# Create and pack widgets
-title_label = tk.Label(
-    root, text="Select Date to Extract Episodes", font=("Arial", 12, "bold")
-)
-title_label.pack(pady=20)
-
-# Date picker
-cal = DateEntry(
-    root,
-    width=20,
-    background="darkblue",
-    foreground="white",
-    borderwidth=2,
-    date_pattern="dd-mm-yyyy",
-    font=("Arial", 11),
-)
-cal.pack(pady=10)
-
-# Extract button
-extract_btn = tk.Button(
-    root,
-    text="Extract to Excel",
-    command=extract_episodes,
-    font=("Arial", 10),
-    bg="#4CAF50",
-    fg="white",
-    padx=20,
-    pady=10,
-    cursor="hand2",
-)
-extract_btn.pack(pady=20)
-
-# Center window on screen
-root.update_idletasks()
-width = root.winfo_width()
-height = root.winfo_height()
-x = (root.winfo_screenwidth() // 2) - (width // 2)
-y = (root.winfo_screenheight() // 2) - (height // 2)
-root.geometry(f"{width}x{height}+{x}+{y}")
-
-# Run the application
-root.mainloop()
+    # Run the application
+    root.mainloop()
@@ -0,0 +1,247 @@
+"""Procedure counts by year, month, column, item code and endoscopist.
+
+The counts for the whole of episodes.csv are kept in count_cube.json and
+brought up to date with a CsvTail (see csv_tail.py) each run. Any year,
+half-year, quarter or month total is then a sum of a few cube cells:
+
+    python count_cube.py 2025 --months 7-12 --code 30475       dilatations in H2
+    python count_cube.py 2025 --column upper --by month        uppers per month
+    python count_cube.py 2024 2025 --column anal --by quarter  banding per quarter
+
+Item codes are counted as entered, so --code 30475 matches 30475 only, as in
+dilatation_counter. --suffixes adds the suffixed codes (30475-01, 30475-02).
+"""
+import argparse
+import json
+import os
+import platform
+from datetime import date
+
+from csv_tail import CsvTail
+from dec_dates import day_ordinal
+
+if platform.system() == "Windows":
+    episodes_file = r"D:\John TILLET\episode_data\episodes.csv"
+else:
+    episodes_file = "episodes.csv"
+cube_file = "count_cube.json"
+
+PROCEDURE_COLUMNS = ("upper", "colon", "anal")
+CUBE_DIMS = ("year", "month", "column", "code", "endoscopist")
+
+
+class SparseCube:
+    """Counts keyed by one label per dimension, holding only non-zero cells.
+
+    Labels are stored once each and cells are keyed by tuples of their
+    numbers, which keeps the cube (and its json) small.
+
+        cube = SparseCube(("year", "weekday"))
+        cube.add((2025, "Tue"))
+        cube.count(year=2025, weekday={"Mon", "Tue"})
+        cube.totals("weekday", year=range(2020, 2026))
+    """
+
+    def __init__(self, dims):
+        self.dims = tuple(dims)
+        self.labels = [[] for _ in self.dims]  # number -> label
+        self.numbers = [{} for _ in self.dims]  # label -> number
+        self.cells = {}
+
+    def _number(self, dim, label):
+        numbers = self.numbers[dim]
+        number = numbers.get(label)
+        if number is None:
+            number = numbers[label] = len(self.labels[dim])
+            self.labels[dim].append(label)
+        return number
+
+    def add(self, key, n=1):
+        """Add n to the cell with these labels (one per dimension)."""
+        cell = tuple(self._number(dim, label) for dim, label in enumerate(key))
+        self.cells[cell] = self.cells.get(cell, 0) + n
+
+    def _matcher(self, where):
+        """[(dim, allowed numbers)] for a where dict, or None if nothing can match.
+
+        A where value is a single label or a set, list, tuple or range of them.
+        """
+        tests = []
+        for name, wanted in where.items():
+            if wanted is None:
+                continue
+            dim = self.dims.index(name)
+            if not isinstance(wanted, (set, frozenset, list, tuple, range)):
+                wanted = (wanted,)
+            allowed = {self.numbers[dim][label] for label in wanted if label in self.numbers[dim]}
+            if not allowed:
+                return None
+            tests.append((dim, allowed))
+        return tests
+
+    def _matching(self, where):
+        tests = self._matcher(where)
+        if tests is None:
+            return
+        for cell, n in self.cells.items():
+            if all(cell[dim] in allowed for dim, allowed in tests):
+                yield cell, n
+
+    def count(self, **where):
+        """Sum of the cells matching where, e.g. count(year=2025, month=range(1, 7))."""
+        return sum(n for cell, n in self._matching(where))
+
+    def totals(self, by, **where):
+        """{label of dimension by: sum} over the cells matching where.
+
+        by may be a tuple of dimensions, giving {tuple of labels: sum}.
+        """
+        if isinstance(by, tuple):
+            dims = [self.dims.index(name) for name in by]
+            result = {}
+            for cell, n in self._matching(where):
+                label = tuple(self.labels[dim][cell[dim]] for dim in dims)
+                result[label] = result.get(label, 0) + n
+            return result
+        dim = self.dims.index(by)
+        labels = self.labels[dim]
+        result = {}
+        for cell, n in self._matching(where):
+            label = labels[cell[dim]]
+            result[label] = result.get(label, 0) + n
+        return result
+
+    def to_json(self):
+        return {
+            "dims": self.dims,
+            "labels": self.labels,
+            "cells": [list(cell) + [n] for cell, n in self.cells.items()],
+        }
+
+    @classmethod
+    def from_json(cls, saved):
+        cube = cls(saved["dims"])
+        cube.labels = saved["labels"]
+        cube.numbers = [{label: i for i, label in enumerate(labels)} for labels in cube.labels]
+        cube.cells = {tuple(cell[:-1]): cell[-1] for cell in saved["cells"]}
+        return cube
+
+
+class CountCube:
+    """SparseCube of episodes.csv procedures, kept up to date with the file.
+
+    Subclasses count something else by changing dims and keys().
+    """
+
+    dims = CUBE_DIMS
+    version = 2  # bumped when keys() changes, so saved cubes are rebuilt
+
+    def __init__(self, cube_path=cube_file, csv_path=episodes_file):
+        self.cube_path = cube_path
+        self.csv_path = csv_path
+        self.cube = SparseCube(self.dims)
+        self.tail_state = None
+
+    @classmethod
+    def load(cls, cube_path=cube_file, csv_path=episodes_file):
+        """Load the saved cube and bring it up to date with episodes.csv."""
+        counts = cls(cube_path, csv_path)
+        if os.path.exists(cube_path):
+            with open(cube_path) as f:
+                saved = json.load(f)
+            if saved.get("version", 1) == cls.version:
+                counts.cube = SparseCube.from_json(saved["cube"])
+                counts.tail_state = saved["tail"]
+        if counts.update():
+            counts.save()
+        return counts
+
+    def update(self):
+        """Count any rows appended to episodes.csv. Returns the number read."""
+        tail = CsvTail(self.csv_path, self.tail_state)
+        if tail.replaced():
+            self.cube = SparseCube(self.dims)
+        added = 0
+        for row in tail.rows():
+            self.add(row)
+            added += 1
+        self.tail_state = tail.state
+        return added
+
+    def add(self, row):
+        try:
+            d = date.fromordinal(day_ordinal(row["date"]))
+        except ValueError:
+            return
+        for key in self.keys(row, d):
+            self.cube.add(key)
+
+    def keys(self, row, d):
+        """The cells (one label per dimension) a row of episodes.csv on date d counts in."""
+        for column in PROCEDURE_COLUMNS:
+            value = (row.get(column) or "").strip()
+            if value:
+                yield (d.year, d.month, column, value, row["endo"])
+
+    def save(self):
+        temp_path = f"{self.cube_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"version": self.version, "tail": self.tail_state, "cube": self.cube.to_json()}, f)
+        os.replace(temp_path, self.cube_path)
+
+    def count(self, **where):
+        return self.cube.count(**where)
+
+    def with_suffixes(self, code):
+        """code and every counted code that is code with a "-" suffix."""
+        dim = self.dims.index("code")
+        return [label for label in self.cube.labels[dim] if label.partition("-")[0] == code]
+
+    def totals(self, by, **where):
+        return self.cube.totals(by, **where)
+
+
+def month_range(text):
+    """'7-12' -> range(7, 13), '3' -> range(3, 4)."""
+    first, _, last = text.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procedure counts from episodes.csv")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int, nargs="?")
+    parser.add_argument("--months", type=month_range, help="e.g. 7-12")
+    parser.add_argument("--column", choices=PROCEDURE_COLUMNS)
+    parser.add_argument("--code")
+    parser.add_argument("--suffixes", action="store_true", help="--code also matches 30475-01 etc.")
+    parser.add_argument("--endo")
+    parser.add_argument("--by", choices=["year", "month", "quarter", "column", "code", "endoscopist"])
+    args = parser.parse_args(argv)
+
+    counts = CountCube.load()
+    where = {
+        "year": range(args.first_year, (args.last_year or args.first_year) + 1),
+        "month": args.months,
+        "column": args.column,
+        "code": counts.with_suffixes(args.code) if args.suffixes and args.code else args.code,
+        "endoscopist": args.endo,
+    }
+    if args.by is None:
+        print(counts.count(**where))
+    elif args.by == "quarter":
+        for year in where["year"]:
+            for quarter in range(1, 5):
+                months = range(quarter * 3 - 2, quarter * 3 + 1)
+                if args.months is not None:
+                    months = [m for m in months if m in args.months]
+                total = counts.count(**dict(where, year=year, month=months))
+                print(f"{year} Q{quarter}".ljust(25) + str(total))
+    else:
+        totals = counts.totals(args.by, **where)
+        for label in sorted(totals):
+            print(str(label).ljust(25) + str(totals[label]))
+
+
+if __name__ == "__main__":
+    main()
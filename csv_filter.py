@@ -0,0 +1,276 @@
+"""Streaming filter and column selection for episodes.csv and day_surgery.csv.
+
+Conditions are given by column name (or position) and combined into a
+single function of a csv row, so each row costs one call. Lines that can't
+match - because they don't contain any of the values looked for - are
+dropped before the csv module splits them, and rows are written in blocks.
+
+    python csv_filter.py day_surgery.csv glp.csv --headerless --isin glp1=Yes,No
+    python csv_filter.py episodes.csv out.csv --dates date=01-01-2024:31-12-2024 \\
+        --prefix upper=30475 --columns date,mrn,endo,upper
+"""
+import argparse
+import csv
+from datetime import date
+from itertools import islice
+from operator import itemgetter
+
+from dec_dates import day_ordinal
+
+# day_surgery.csv has no header row
+DAY_SURGERY_FIELDS = [
+    "date",
+    "mrn",
+    "in_theatre",
+    "out_theatre",
+    "anaesthetist",
+    "endoscopist",
+    "asa",
+    "upper",
+    "colon",
+    "banding",
+    "nurse",
+    "clips",
+    "glp1",
+    "message",
+]
+
+BUFFER_SIZE = 1 << 16
+BATCH_SIZE = 5000
+
+
+def safe_day(date_string):
+    """Day number of a DD-MM-YYYY date, or -1 if it isn't one."""
+    try:
+        return day_ordinal(date_string)
+    except ValueError:
+        return -1
+
+
+class RowFilter:
+    """Conditions on the columns of a csv file, all of which a row must meet.
+
+    Each method adds one condition and returns the filter, so they chain:
+
+        RowFilter(DAY_SURGERY_FIELDS).isin("glp1", {"Yes", "No"}).prefix("upper", "30")
+
+    Columns can be names from fieldnames or positions.
+    """
+
+    def __init__(self, fieldnames):
+        self.fieldnames = list(fieldnames)
+        self.tests = []  # functions of a row
+        self.width = 0  # rows shorter than this can't match
+        self.line_tests = []  # functions of the unsplit line
+
+    def position(self, column):
+        if isinstance(column, int):
+            return column
+        return self.fieldnames.index(column)
+
+    def _add(self, position, test, literals=()):
+        """Add a test on the column at position. A matching line must contain
+        one of literals."""
+        self.tests.append(test)
+        self.width = max(self.width, position + 1)
+        # csv doubles any quote in a value, so those can't be looked for as is
+        if literals and all(text and '"' not in text for text in literals):
+            if len(literals) == 1:
+                text = literals[0]
+                self.line_tests.append(lambda line: text in line)
+            else:
+                literals = tuple(literals)
+
+                def contains(line):
+                    for text in literals:
+                        if text in line:
+                            return True
+                    return False
+
+                self.line_tests.append(contains)
+        return self
+
+    def eq(self, column, value):
+        position = self.position(column)
+        return self._add(position, lambda row: row[position] == value, (value,))
+
+    def isin(self, column, values):
+        position = self.position(column)
+        values = frozenset(values)
+        return self._add(position, lambda row: row[position] in values, sorted(values))
+
+    def prefix(self, column, prefixes):
+        """The column starts with prefixes (a string or several)."""
+        position = self.position(column)
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        prefixes = tuple(prefixes)
+        return self._add(position, lambda row: row[position].startswith(prefixes), prefixes)
+
+    def dates(self, column, start=None, end=None):
+        """The column is a DD-MM-YYYY date from start to end (dates) inclusive."""
+        position = self.position(column)
+        low = start.toordinal() if start else 0
+        high = end.toordinal() if end else float("inf")
+        return self._add(position, lambda row: low <= safe_day(row[position]) <= high)
+
+    def compile(self, min_width=0):
+        """A function of a row (a list) that is True when every condition holds.
+
+        Rows with fewer than min_width columns never match.
+        """
+        width = max(self.width, min_width)
+        tests = tuple(self.tests)
+        if len(tests) == 1:
+            test = tests[0]
+            return lambda row: len(row) >= width and test(row)
+
+        def match(row):
+            if len(row) < width:
+                return False
+            for test in tests:
+                if not test(row):
+                    return False
+            return True
+
+        return match
+
+    def compile_line(self):
+        """A quick test of an unsplit line: False means the row can't match.
+
+        Returns None when there is nothing to test.
+        """
+        line_tests = tuple(self.line_tests)
+        if not line_tests:
+            return None
+        if len(line_tests) == 1:
+            return line_tests[0]
+
+        def line_match(line):
+            for test in line_tests:
+                if not test(line):
+                    return False
+            return True
+
+        return line_match
+
+
+def selector(positions):
+    """A function taking a row to the columns at positions, as a tuple."""
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda row: (row[position],)
+    return itemgetter(*positions)
+
+
+def filter_rows(rows, match, select=None):
+    """Yield the rows meeting match, cut down to select's columns if given."""
+    if select is None:
+        return filter(match, rows)
+    return map(select, filter(match, rows))
+
+
+def filter_csv(in_path, out_path, row_filter, columns=None, header=True):
+    """Copy the rows of in_path meeting row_filter to out_path.
+
+    header says whether in_path starts with a header row. If it does, the
+    header (cut down to columns) is written to out_path too; otherwise the
+    filter's fieldnames are used to find columns. Rows are taken to be one
+    line each. Returns the number of rows written.
+    """
+    written = 0
+    with open(in_path, newline="", buffering=BUFFER_SIZE) as f_in, open(
+        out_path, "w", newline="", buffering=BUFFER_SIZE
+    ) as f_out:
+        reader = csv.reader(f_in)
+        writer = csv.writer(f_out)
+        if header:
+            fieldnames = next(reader, None)
+            if fieldnames is None:
+                return written
+            writer.writerow(
+                [fieldnames[row_filter.position(c)] for c in columns] if columns else fieldnames
+            )
+
+        if columns:
+            positions = [row_filter.position(c) for c in columns]
+            match = row_filter.compile(min_width=max(positions) + 1)
+            select = selector(positions)
+        else:
+            match = row_filter.compile()
+            select = None
+
+        line_match = row_filter.compile_line()
+        if line_match is not None:
+            reader = csv.reader(filter(line_match, f_in))
+        rows = filter_rows(reader, match, select)
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+def column_value(text):
+    column, _, value = text.partition("=")
+    return (int(column) if column.isdigit() else column), value
+
+
+def day_date(date_string):
+    return date.fromordinal(day_ordinal(date_string))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy the matching rows of a csv file")
+    parser.add_argument("in_path")
+    parser.add_argument("out_path")
+    parser.add_argument(
+        "--headerless", action="store_true", help="day_surgery.csv layout, no header row"
+    )
+    parser.add_argument("--eq", action="append", default=[], metavar="COLUMN=VALUE")
+    parser.add_argument("--isin", action="append", default=[], metavar="COLUMN=A,B")
+    parser.add_argument("--prefix", action="append", default=[], metavar="COLUMN=A,B")
+    parser.add_argument(
+        "--dates", action="append", default=[], metavar="COLUMN=DD-MM-YYYY:DD-MM-YYYY",
+        help="either end may be left empty",
+    )
+    parser.add_argument("--columns", help="comma separated columns to keep")
+    args = parser.parse_args(argv)
+
+    if args.headerless:
+        fieldnames = DAY_SURGERY_FIELDS
+    else:
+        with open(args.in_path, newline="") as f:
+            fieldnames = next(csv.reader(f), [])
+
+    row_filter = RowFilter(fieldnames)
+    for text in args.eq:
+        row_filter.eq(*column_value(text))
+    for text in args.isin:
+        column, values = column_value(text)
+        row_filter.isin(column, values.split(","))
+    for text in args.prefix:
+        column, values = column_value(text)
+        row_filter.prefix(column, values.split(","))
+    for text in args.dates:
+        column, value = column_value(text)
+        start, _, end = value.partition(":")
+        row_filter.dates(
+            column,
+            day_date(start) if start else None,
+            day_date(end) if end else None,
+        )
+
+    columns = None
+    if args.columns:
+        columns = [int(c) if c.isdigit() else c for c in args.columns.split(",")]
+    written = filter_csv(
+        args.in_path, args.out_path, row_filter, columns, header=not args.headerless
+    )
+    print(f"{written} rows written to {args.out_path}")
+
+
+if __name__ == "__main__":
+    main()
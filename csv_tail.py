@@ -0,0 +1,68 @@
+"""Read only the rows added to a csv file since it was last read.
+
+episodes.csv and day_surgery.csv are only ever appended to, so anything built
+from them can remember how far it got (a byte offset) and carry on from there
+next time. If the file is now shorter than that offset or its first line has
+changed, it has been replaced and has to be read again from the start.
+"""
+import csv
+import os
+
+HEAD_LENGTH = 200
+
+
+class CsvTail:
+    """Rows appended to a csv file after a saved position.
+
+    state is the dict saved from a previous run ({"offset": ..., "head": ...}),
+    or None to read the whole file. Pass fieldnames for files without a header
+    row (day_surgery.csv); otherwise the header is read from the first line.
+    A final line with no newline yet is left for the next read.
+    """
+
+    def __init__(self, path, state=None, fieldnames=None, encoding="utf-8"):
+        self.path = path
+        self.state = dict(state) if state else {"offset": 0, "head": ""}
+        self.fieldnames = fieldnames
+        self.encoding = encoding
+
+    def _first_line(self):
+        with open(self.path, "rb") as f:
+            return f.readline()
+
+    def replaced(self):
+        """True if the file no longer starts the way it did when state was saved.
+
+        The saved position is reset, so rows() will then read the whole file.
+        """
+        if self.state["offset"] == 0:
+            return False
+        head = self._first_line()[:HEAD_LENGTH].decode(self.encoding, "replace")
+        if os.path.getsize(self.path) < self.state["offset"] or head != self.state["head"]:
+            self.state = {"offset": 0, "head": ""}
+            return True
+        return False
+
+    def rows(self):
+        """Yield each new row as a dict, moving the saved position past it."""
+        with open(self.path, "rb") as f:
+            first = f.readline()
+            if not first:
+                return
+            self.state["head"] = first[:HEAD_LENGTH].decode(self.encoding, "replace")
+
+            fieldnames = self.fieldnames
+            if fieldnames is None:
+                fieldnames = next(csv.reader([first.decode(self.encoding, "replace")]))
+                if self.state["offset"] == 0:
+                    self.state["offset"] = len(first)
+
+            f.seek(self.state["offset"])
+            yield from csv.DictReader(self._lines(f), fieldnames=fieldnames)
+
+    def _lines(self, f):
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # still being written
+            self.state["offset"] += len(raw)
+            yield raw.decode(self.encoding, "replace")
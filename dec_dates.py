@@ -0,0 +1,51 @@
+"""Cached parsing of the DD-MM-YYYY dates used in episodes.csv and day_surgery.csv.
+
+A few hundred distinct procedure dates a year get parsed over and over -
+once per row and again for every comparison - so each string is turned into
+an integer day number (date.toordinal()) once and remembered. The parser
+reads the fixed positions of the day, month and year rather than calling
+strptime, and falls back to strptime for anything not zero padded.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+
+CACHE_SIZE = 8192  # about 30 years of procedure dates
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def day_ordinal(date_string):
+    """DD-MM-YYYY -> integer day number. Raises ValueError for a bad date."""
+    if len(date_string) == 10 and date_string[2] == "-" and date_string[5] == "-":
+        try:
+            return date(
+                int(date_string[6:10]), int(date_string[3:5]), int(date_string[0:2])
+            ).toordinal()
+        except ValueError:
+            pass
+    return datetime.strptime(date_string, "%d-%m-%Y").toordinal()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def year_quarter(date_string):
+    """DD-MM-YYYY -> (year as a string, last month of its quarter: 3, 6, 9 or 12)."""
+    d = date.fromordinal(day_ordinal(date_string))
+    return str(d.year), (d.month - 1) // 3 * 3 + 3
+
+
+def cache_stats():
+    """Hit/miss counts for the date caches, e.g. to check CACHE_SIZE is enough."""
+    stats = {}
+    for name, func in (("day_ordinal", day_ordinal), ("year_quarter", year_quarter)):
+        info = func.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return stats
+
+
+def clear_cache():
+    day_ordinal.cache_clear()
+    year_quarter.cache_clear()
@@ -6,42 +6,98 @@ if platform.system() == "Windows":
 else:
     csv_path = "episodes.csv"
 
-print("Welcome to Dilatation Counter")
-print()
+periods = {
+    "1": ("January-June", 1, 6),
+    "2": ("July-December", 7, 12),
+}
 
-year = input("Enter year: ")
 
-print("Select period:")
-print("1. January-June")
-print("2. July-December")
-period_choice = input("Enter 1 or 2: ")
+PROCEDURE_COLUMNS = ("upper", "colon", "anal")
+DILATATION = "30475"
 
-if period_choice == "1":
-    period_name = "January-June"
-    start_month = 1
-    end_month = 6
-else:
-    period_name = "July-December"
-    start_month = 7
-    end_month = 12
-
-dilatation_count = 0
-upper_endoscopy_count = 0
-
-with open(csv_path, "r") as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        date_parts = row["date"].split("-")
-        entry_day = int(date_parts[0])
-        entry_month = int(date_parts[1])
-        entry_year = date_parts[2]
-
-        if entry_year == year and start_month <= entry_month <= end_month:
-            if row["upper"].strip():
-                upper_endoscopy_count += 1
-            if row["upper"] == "30475":
-                dilatation_count += 1
-
-print()
-print(f"The number of upper endoscopies performed in the period {period_name} {year} was {upper_endoscopy_count}.")
-print(f"The number of dilatations performed in the period {period_name} {year} was {dilatation_count}.")
+
+def count_codes(csv_path, codes, periods, columns=PROCEDURE_COLUMNS, suffixes=False):
+    """Count MBS item codes in the procedure columns for several periods in one pass.
+
+    periods is a list of (year, start_month, end_month); they may overlap.
+    A code matches a column whose value is exactly the code, or with
+    suffixes=True the code with any "-" suffix as well (30473-01 counts as 30473).
+    Returns (codes table, procedures table):
+        {code: {period: count}} for each of codes
+        {column: {period: count}} rows with anything in each column
+    """
+    periods = [(str(year), start, end) for year, start, end in periods]
+    code_table = {code: dict.fromkeys(periods, 0) for code in codes}
+    column_table = {column: dict.fromkeys(periods, 0) for column in columns}
+
+    # (year, month) -> the periods it falls in
+    month_periods = {}
+    for period in periods:
+        year, start, end = period
+        for month in range(start, end + 1):
+            month_periods.setdefault((year, month), []).append(period)
+
+    with open(csv_path, "r") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            date_parts = row["date"].split("-")
+            in_periods = month_periods.get((date_parts[-1], int(date_parts[1])))
+            if not in_periods:
+                continue
+            for column in columns:
+                value = row[column].strip()
+                if not value:
+                    continue
+                for period in in_periods:
+                    column_table[column][period] += 1
+                code = value.partition("-")[0] if suffixes else row[column]
+                if code in code_table:
+                    for period in in_periods:
+                        code_table[code][period] += 1
+
+    return code_table, column_table
+
+
+def count_procedures(csv_path, year, start_month, end_month):
+    """Count upper endoscopies and dilatations (30475) between two months of a year."""
+    period = (str(year), start_month, end_month)
+    code_table, column_table = count_codes(csv_path, [DILATATION], [period], ["upper"])
+    return {
+        "dilatation": code_table[DILATATION][period],
+        "upper_endoscopy": column_table["upper"][period],
+    }
+
+
+def result_lines(period_name, year, results):
+    return [
+        f"The number of upper endoscopies performed in the period {period_name} {year} was {results['upper_endoscopy']}.",
+        f"The number of dilatations performed in the period {period_name} {year} was {results['dilatation']}.",
+    ]
+
+
+def write_report(period_name, year, results, path):
+    with open(path, "w") as file:
+        file.write("\n".join(result_lines(period_name, year, results)) + "\n")
+
+
+def main():
+    print("Welcome to Dilatation Counter")
+    print()
+
+    year = input("Enter year: ")
+
+    print("Select period:")
+    print("1. January-June")
+    print("2. July-December")
+    period_choice = input("Enter 1 or 2: ")
+
+    period_name, start_month, end_month = periods.get(period_choice, periods["2"])
+    results = count_procedures(csv_path, year, start_month, end_month)
+
+    print()
+    for line in result_lines(period_name, year, results):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import csv
-from dilatation_counter import count_procedures
+from dilatation_counter import count_codes, count_procedures
 
 
 # Helper to write a small CSV file for testing
@@ -68,6 +68,54 @@ def test_rows_outside_date_range_excluded(tmp_path):
     assert results["dilatation"] == 1
 
 
+def test_count_codes_table(tmp_path):
+    """Several codes in any procedure column, counted for each period."""
+    csv_file = tmp_path / "episodes.csv"
+    write_test_csv(csv_file, [
+        {"date": "10-03-2025", "upper": "30475", "colon": "32090"},
+        {"date": "15-04-2025", "upper": "30473-01", "colon": "32093"},
+        {"date": "20-09-2025", "colon": "32090", "anal": "32135"},
+        {"date": "20-09-2024", "colon": "32090"},
+    ])
+    first_half, second_half = ("2025", 1, 6), ("2025", 7, 12)
+    codes, procedures = count_codes(
+        str(csv_file), ["30475", "30473", "32090", "32135"], [first_half, second_half],
+        suffixes=True,
+    )
+    assert codes["30475"] == {first_half: 1, second_half: 0}
+    assert codes["30473"] == {first_half: 1, second_half: 0}
+    assert codes["32090"] == {first_half: 1, second_half: 1}
+    assert codes["32135"] == {first_half: 0, second_half: 1}
+    assert procedures["colon"] == {first_half: 2, second_half: 1}
+    assert procedures["upper"] == {first_half: 2, second_half: 0}
+
+
+def test_suffixed_codes_are_not_dilatations(tmp_path):
+    """Only an exact 30475 is a dilatation unless suffixes are asked for."""
+    csv_file = tmp_path / "episodes.csv"
+    write_test_csv(csv_file, [
+        {"date": "10-03-2025", "upper": "30475"},
+        {"date": "15-04-2025", "upper": "30475-01"},
+    ])
+    results = count_procedures(str(csv_file), "2025", 1, 6)
+    assert results["dilatation"] == 1
+    assert results["upper_endoscopy"] == 2
+    codes, procedures = count_codes(str(csv_file), ["30475"], [("2025", 1, 6)], suffixes=True)
+    assert codes["30475"] == {("2025", 1, 6): 2}
+
+
+def test_count_codes_overlapping_periods(tmp_path):
+    """A row is counted in every period that contains it."""
+    csv_file = tmp_path / "episodes.csv"
+    write_test_csv(csv_file, [
+        {"date": "10-03-2025", "upper": "30475"},
+        {"date": "10-11-2025", "upper": "30475"},
+    ])
+    year, first_half = (2025, 1, 12), ("2025", 1, 6)
+    codes, procedures = count_codes(str(csv_file), ["30475"], [year, first_half])
+    assert codes["30475"] == {("2025", 1, 12): 2, first_half: 1}
+
+
 # ---------------------------------------------------------------------------
 # LEARNING EXAMPLES: capsys and monkeypatch fixtures
 # These tests demonstrate how the fixtures work. They don't test
@@ -0,0 +1,246 @@
+"""Running answer-rate and issue-rate counters for follow_up.csv.
+
+Counters are kept per month of procedure, split by endoscopist, anaesthetist
+and procedure type, and are updated as each result is written rather than by
+rescanning the log. They persist to follow_up_stats.json, so a monthly
+report only has to read that file.
+
+Run this file directly to print and write the report for one month.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+
+GROUPS = {"endo": "Endoscopist", "anaes": "Anaesthetist", "procedure": "Procedure"}
+
+
+def counter_template():
+    # days is a histogram of days-to-call so the median can be updated cheaply
+    return {"answered": 0, "unanswered": 0, "issue": 0, "days": {}}
+
+
+def procedure_type(row):
+    """Describe the procedure from the upper/colon/anal columns."""
+    parts = []
+    if row.get("upper", "").strip():
+        parts.append("upper")
+    if row.get("colon", "").strip():
+        parts.append("colon")
+    if row.get("anal", "").strip():
+        parts.append("banding")
+    return " + ".join(parts) or "other"
+
+
+def month_key(date_string):
+    """DD-MM-YYYY -> YYYY-MM"""
+    return f"{date_string[6:10]}-{date_string[3:5]}"
+
+
+def median_days(histogram):
+    """Median of a {days: count} histogram, or None if it is empty."""
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+    running = 0
+    for days in sorted(histogram, key=int):
+        running += histogram[days]
+        if running * 2 >= total:
+            return int(days)
+
+
+def file_key(path):
+    """Size and modification time of follow_up.csv, or None if it isn't there."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+class FollowUpStats:
+    """Per-month follow-up counters, loaded from and saved to a json file.
+
+    The file records the size and modification time follow_up.csv had when
+    the counters matched it, so a row lost or edited outside the program is
+    noticed and the counters rebuilt.
+    """
+
+    def __init__(self, path, months=None, followup_file=None):
+        self.path = path
+        self.months = months if months is not None else {}
+        self.followup_file = followup_file
+        self.key = None
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path, followup_file=None):
+        with open(path) as f:
+            saved = json.load(f)
+        stats = cls(path, saved["months"], followup_file)
+        stats.key = saved.get("key")
+        return stats
+
+    @classmethod
+    def load_or_rebuild(cls, path, followup_file):
+        """Load the saved counters, or rebuild them from follow_up.csv if they
+        are missing or the csv has changed since they were saved.
+
+        follow_up.csv does not record when a call was made, so days-to-call
+        history is carried over from the old counters where they had it.
+        """
+        old = None
+        if os.path.exists(path):
+            old = cls.load(path, followup_file)
+            if old.key == file_key(followup_file):
+                return old
+
+        stats = cls(path, followup_file=followup_file)
+        if os.path.exists(followup_file) and os.path.getsize(followup_file) > 0:
+            with open(followup_file, newline="") as f:
+                for row in csv.DictReader(f):
+                    stats.record_result(row)
+        if old is not None:
+            stats.keep_days(old)
+        stats.save()
+        return stats
+
+    def keep_days(self, old):
+        """Copy the days-to-call histograms from old for the counters both have."""
+        for month, groups in old.months.items():
+            for group, names in groups.items():
+                for name, counters in names.items():
+                    new = self.months.get(month, {}).get(group, {}).get(name)
+                    if new is not None:
+                        new["days"] = counters["days"]
+
+    def _counters(self, row):
+        """The three counter dicts (endo, anaes, procedure) a row belongs to."""
+        month = self.months.setdefault(month_key(row["date"]), {})
+        keys = {
+            "endo": row.get("endo", "") or "unknown",
+            "anaes": row.get("anaes", "") or "unknown",
+            "procedure": procedure_type(row),
+        }
+        return [
+            month.setdefault(group, {}).setdefault(name, counter_template())
+            for group, name in keys.items()
+        ]
+
+    def record_result(self, row, call_date=None):
+        """Count a newly written follow_up.csv row.
+
+        call_date is when the patient was called; without it the row is
+        counted but adds nothing to the days-to-call median.
+        """
+        days = None
+        if call_date is not None:
+            procedure_date = datetime.strptime(row["date"], "%d-%m-%Y")
+            days = str((call_date - procedure_date).days)
+
+        answered = row.get("answered") == "yes"
+        for counters in self._counters(row):
+            if answered:
+                counters["answered"] += 1
+            else:
+                counters["unanswered"] += 1
+            if row.get("issue") == "yes":
+                counters["issue"] += 1
+            if days is not None:
+                counters["days"][days] = counters["days"].get(days, 0) + 1
+        self.dirty = True
+
+    def record_update(self, old_row, issue):
+        """Adjust the counters after update_followup_row changed old_row.
+
+        A callback always marks the patient answered and replaces the issue.
+        """
+        was_answered = old_row.get("answered") == "yes"
+        issue_change = (issue == "yes") - (old_row.get("issue") == "yes")
+        for counters in self._counters(old_row):
+            if not was_answered:
+                counters["unanswered"] -= 1
+                counters["answered"] += 1
+            counters["issue"] += issue_change
+        self.dirty = True
+
+    def save(self):
+        """Write the counters to disk (via a temp file so a crash can't corrupt them).
+
+        Call this only when follow_up.csv holds every row counted.
+        """
+        if self.followup_file is not None:
+            self.key = file_key(self.followup_file)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"key": self.key, "months": self.months}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def month_summary(self, year, month):
+        """Return {group: {name: counters}} for one month (empty if no calls)."""
+        return self.months.get(f"{year}-{month:02d}", {})
+
+
+def rate(numerator, denominator):
+    """Percentage rate, -1 if there is nothing to divide by."""
+    if denominator == 0:
+        return -1
+    return round((numerator / denominator) * 100)
+
+
+def format_line(name, counters):
+    answered = counters["answered"]
+    called = answered + counters["unanswered"]
+    median = median_days(counters["days"])
+    median_text = "-" if median is None else str(median)
+    return (
+        f"{name.ljust(25)} {str(called).ljust(8)} {str(rate(answered, called)).ljust(10)} "
+        f"{str(rate(counters['issue'], answered)).ljust(10)} {median_text}"
+    )
+
+
+def report_lines(stats, year, month):
+    """Build the monthly report from the saved counters."""
+    summary = stats.month_summary(year, month)
+    lines = [f"FOLLOW-UP CALLS FOR PROCEDURES IN {month:02d}/{year}", ""]
+    if not summary:
+        lines.append("No follow-up calls recorded.")
+        return lines
+
+    for group, title in GROUPS.items():
+        lines.append("")
+        lines.append(f"{title.ljust(25)} Called   %Answered  %Issue     Median days to call")
+        lines.append("")
+        for name, counters in sorted(summary.get(group, {}).items()):
+            lines.append(format_line(name, counters))
+    return lines
+
+
+def write_report(stats, year, month, path):
+    lines = report_lines(stats, year, month)
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    for line in lines:
+        print(line)
+
+
+def intro():
+    while True:
+        year = input("Year as 4 digits:  ")
+        if year.isdigit() and len(year) == 4:
+            break
+
+    while True:
+        month = input("Month as a number, 1-12: ")
+        if month.isdigit() and 1 <= int(month) <= 12:
+            break
+
+    return year, int(month)
+
+
+if __name__ == "__main__":
+    from main import FOLLOWUP_FILE, STATS_FILE, code_base
+
+    year, month = intro()
+    stats = FollowUpStats.load_or_rebuild(STATS_FILE, FOLLOWUP_FILE)
+    write_report(stats, year, month, code_base / "follow_up_report.txt")
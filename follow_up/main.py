@@ -6,7 +6,12 @@ import subprocess
 import tkinter as tk
 from datetime import datetime, timedelta
 from pathlib import Path
-from tkinter import ttk
+from tkinter import messagebox, ttk
+
+from analytics import FollowUpStats
+from search_index import PatientIndex
+from widgets import VirtualList
+from writer import ResultWriter
 
 # ========== CONFIGURATION ==========
 # File paths — Windows uses production paths, Mac uses current directory
@@ -24,6 +29,10 @@ START_DATE = config["settings"]["start_date"]
 
 EPISODES_FILE = data_base / "episodes.csv"
 FOLLOWUP_FILE = code_base / "follow_up.csv"
+STATS_FILE = code_base / "follow_up_stats.json"
+
+# Show the saving indicator once this many rows are waiting to be written
+BACKLOG_WARNING = 3
 # ====================================
 
 
@@ -107,59 +116,42 @@ def clear_display(labels, counter_label):
     counter_label.config(text="")
 
 
-def write_result(patient, answered, issue, issue_text):
-    """Append one row to follow_up.csv with original patient data plus follow-up fields."""
-    # Get the column names from the patient dict (original CSV columns)
-    original_columns = list(patient.keys())
-    all_columns = original_columns + ["answered", "issue", "issue_text"]
-
-    # Check if we need to write a header (file doesn't exist or is empty)
-    write_header = (
-        not os.path.exists(FOLLOWUP_FILE) or os.path.getsize(FOLLOWUP_FILE) == 0
-    )
-
-    with open(FOLLOWUP_FILE, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=all_columns)
-
-        if write_header:
-            writer.writeheader()
+def apply_callback(row, issue, issue_text):
+    """Set a follow-up row to answered with the callback's issue details.
 
-        # Build the row: start with all original patient data, add our 3 new fields
-        row = dict(patient)
-        row["answered"] = answered
-        row["issue"] = issue
-        row["issue_text"] = issue_text
-        writer.writerow(row)
+    New issue_text is appended to any existing text (separated by ' | ')
+    so previous notes are preserved.
+    """
+    row["answered"] = "yes"
+    row["issue"] = issue
+    existing = row.get("issue_text", "").strip()
+    new_text = issue_text.strip()
+    if existing and new_text:
+        row["issue_text"] = f"{existing} | {new_text}"
+    elif new_text:
+        row["issue_text"] = new_text
 
 
 def update_followup_row(date, mrn, issue, issue_text):
     """Find a row in follow_up.csv by date+mrn and update its follow-up fields.
 
-    Sets answered to "yes", updates issue, and appends new issue_text
-    to any existing text (separated by ' | ') so previous notes are preserved.
-    Returns True if the row was found and updated, False otherwise.
+    See apply_callback for how the fields change.
+    Returns a copy of the row as it was before the update (so the analytics
+    counters can be adjusted), or None if no row matched.
     """
     rows = []
-    found = False
+    found = None
 
     with open(FOLLOWUP_FILE, newline="") as f:
         reader = csv.DictReader(f)
         fieldnames = reader.fieldnames
         for row in reader:
             if row["date"] == date and row["mrn"] == mrn:
-                row["answered"] = "yes"
-                row["issue"] = issue
-                # Append new details to existing text instead of replacing
-                existing = row.get("issue_text", "").strip()
-                new_text = issue_text.strip()
-                if existing and new_text:
-                    row["issue_text"] = f"{existing} | {new_text}"
-                elif new_text:
-                    row["issue_text"] = new_text
-                found = True
+                found = dict(row)
+                apply_callback(row, issue, issue_text)
             rows.append(row)
 
-    if found:
+    if found is not None:
         with open(FOLLOWUP_FILE, "w", newline="") as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
@@ -168,6 +160,12 @@ def update_followup_row(date, mrn, issue, issue_text):
     return found
 
 
+def format_search_result(row):
+    """One line in the callback search results."""
+    name = f"{row.get('surname', '')}, {row.get('firstname', '')}"
+    return f"{row['date']}  {row['mrn'].ljust(8)} {name.ljust(28)} {row.get('phone', '')}"
+
+
 def main():
     # Load all episodes once at startup
     all_rows = load_episodes(EPISODES_FILE)
@@ -178,10 +176,32 @@ def main():
     index = [0]
     called = [0]
 
+    # All follow_up.csv writes happen on this background thread, which also
+    # keeps the running report counters up to date
+    stats = FollowUpStats.load_or_rebuild(STATS_FILE, FOLLOWUP_FILE)
+    result_writer = ResultWriter(FOLLOWUP_FILE, update_followup_row, stats)
+
+    # Callback search index, built once and added to as results are written
+    patient_index = PatientIndex.from_file(FOLLOWUP_FILE)
+
     # --- Build the window ---
     root = tk.Tk()
     root.title("Follow-Up")
 
+    def on_close():
+        """Make sure every queued row is on disk before the window goes."""
+        left = result_writer.close()
+        if left and not messagebox.askokcancel(
+            "Follow-Up",
+            f"{left} results could not be saved to follow_up.csv "
+            f"({result_writer.error}).\n\nClose anyway and lose them?",
+            icon="warning",
+        ):
+            return  # the writer keeps retrying
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
     # --- Menu bar ---
     def open_config():
         config_path = code_base / "config.ini"
@@ -197,17 +217,21 @@ def main():
         dialog.resizable(False, False)
         pad = {"padx": 10, "pady": 5}
 
-        # Row 0: Date field
-        ttk.Label(dialog, text="Date (DD-MM-YYYY):").grid(row=0, column=0, sticky="w", **pad)
-        date_entry = ttk.Entry(dialog, width=15)
-        date_entry.grid(row=0, column=1, sticky="w", **pad)
-
-        # Row 1: MRN field
-        ttk.Label(dialog, text="MRN:").grid(row=1, column=0, sticky="w", **pad)
-        mrn_entry = ttk.Entry(dialog, width=15)
-        mrn_entry.grid(row=1, column=1, sticky="w", **pad)
-
-        # Row 3: Patient name (hidden until search succeeds)
+        # Row 0: Search field - results update on every keystroke
+        ttk.Label(dialog, text="MRN, surname or phone:").grid(row=0, column=0, sticky="w", **pad)
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(dialog, width=25, textvariable=search_var)
+        search_entry.grid(row=0, column=1, sticky="w", **pad)
+        search_entry.focus_set()
+
+        # Rows 1-2: Matching patients, newest first
+        results = VirtualList(dialog, height=8, width=70,
+                              on_select=lambda row: select_patient(row))
+        results.grid(row=1, column=0, columnspan=2, sticky="we", **pad)
+        result_count = ttk.Label(dialog, text="")
+        result_count.grid(row=2, column=0, columnspan=2, sticky="w", padx=10)
+
+        # Row 3: Patient name (hidden until a patient is selected)
         name_label = ttk.Label(dialog, text="", font=("TkDefaultFont", 11, "bold"))
         name_label.grid(row=3, column=0, columnspan=2, sticky="w", **pad)
         name_label.grid_remove()
@@ -244,52 +268,45 @@ def main():
         # We store the matched row data so Save knows what to update
         matched = [None]
 
-        def do_search():
-            """Look up the patient in follow_up.csv by date + mrn."""
-            search_date = date_entry.get().strip()
-            search_mrn = mrn_entry.get().strip()
+        def disable_update():
+            cb_issue_yes.config(state="disabled")
+            cb_issue_no.config(state="disabled")
+            cb_details_entry.config(state="normal")
+            cb_details_entry.delete(0, "end")
+            cb_details_entry.config(state="disabled")
+            save_button.config(state="disabled")
+
+        def do_search(*args):
+            """Filter follow-up rows by what has been typed so far."""
             msg_label.config(text="", foreground="red")
             name_label.grid_remove()
             matched[0] = None
+            disable_update()
 
-            if not search_date or not search_mrn:
-                msg_label.config(text="Please enter both date and MRN.")
-                return
-
-            if not os.path.exists(FOLLOWUP_FILE) or os.path.getsize(FOLLOWUP_FILE) == 0:
-                msg_label.config(text="No follow-up data found.")
-                return
-
-            with open(FOLLOWUP_FILE, newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["date"] == search_date and row["mrn"] == search_mrn:
-                        matched[0] = row
-                        break
-
-            if matched[0]:
-                patient_name = (f"{matched[0].get('title', '')} "
-                                f"{matched[0].get('firstname', '')} "
-                                f"{matched[0].get('surname', '')}").strip()
-                name_label.config(text=patient_name)
-                name_label.grid()
-                cb_issue_var.set("no")
-                cb_issue_yes.config(state="normal")
-                cb_issue_no.config(state="normal")
-                cb_details_entry.config(state="normal")
-                cb_details_entry.delete(0, "end")
-                cb_details_entry.config(state="disabled")
-                save_button.config(state="normal")
-                msg_label.config(text="Patient found. Update details below.",
-                                 foreground="green")
+            found = patient_index.search(search_var.get())
+            results.set_items(found, format_search_result)
+            if search_var.get().strip():
+                result_count.config(text=f"{len(found)} matching patients")
             else:
-                msg_label.config(text="No matching patient found.")
-                cb_issue_yes.config(state="disabled")
-                cb_issue_no.config(state="disabled")
-                cb_details_entry.config(state="normal")
-                cb_details_entry.delete(0, "end")
-                cb_details_entry.config(state="disabled")
-                save_button.config(state="disabled")
+                result_count.config(text="")
+
+        def select_patient(row):
+            """Show the chosen patient and enable the update fields."""
+            matched[0] = row
+            patient_name = (f"{row.get('title', '')} "
+                            f"{row.get('firstname', '')} "
+                            f"{row.get('surname', '')}").strip()
+            name_label.config(text=f"{patient_name}  ({row['date']})")
+            name_label.grid()
+            cb_issue_var.set("no")
+            cb_issue_yes.config(state="normal")
+            cb_issue_no.config(state="normal")
+            cb_details_entry.config(state="normal")
+            cb_details_entry.delete(0, "end")
+            cb_details_entry.config(state="disabled")
+            save_button.config(state="normal")
+            msg_label.config(text="Patient found. Update details below.",
+                             foreground="green")
 
         def do_save():
             """Update the matched row in follow_up.csv and close the dialog."""
@@ -301,14 +318,13 @@ def main():
                                  foreground="red")
                 return
 
-            search_date = date_entry.get().strip()
-            search_mrn = mrn_entry.get().strip()
-            update_followup_row(search_date, search_mrn, issue, details)
+            row = matched[0]
+            result_writer.update_row(row["date"], row["mrn"], issue, details)
+            # Keep the in-memory copy in step with the file
+            apply_callback(row, issue, details)
             dialog.destroy()
 
-        # Row 2: Search button
-        search_button = ttk.Button(dialog, text="Search", command=do_search)
-        search_button.grid(row=2, column=0, columnspan=2, pady=5)
+        search_var.trace_add("write", do_search)
 
         # Row 7: Save button
         save_button = ttk.Button(dialog, text="Save", command=do_save, state="disabled")
@@ -328,6 +344,23 @@ def main():
     count_label = ttk.Label(top_frame, text="")
     count_label.pack(side="left")
 
+    # Only shows text when writes are backing up or failing
+    save_label = ttk.Label(top_frame, text="", foreground="orange")
+    save_label.pack(side="right")
+
+    def check_writer():
+        """Poll the writer queue and update the saving indicator."""
+        waiting = result_writer.pending()
+        if result_writer.error:
+            save_label.config(text=f"Save problem - {waiting} rows waiting",
+                              foreground="red")
+        elif waiting >= BACKLOG_WARNING:
+            save_label.config(text=f"Saving... {waiting} rows queued",
+                              foreground="orange")
+        else:
+            save_label.config(text="")
+        root.after(500, check_writer)
+
     # --- Middle frame: patient data display ---
     data_frame = ttk.Frame(root, padding=10)
     data_frame.pack(fill="x")
@@ -513,9 +546,10 @@ def main():
         issue = issue_var.get()
         issue_text = details_entry.get().strip()
 
-        # Write this patient's result to CSV
+        # Queue this patient's result for the writer thread
         current_patient = filtered[0][index[0]]
-        write_result(current_patient, answered, issue, issue_text)
+        row = result_writer.write_result(current_patient, answered, issue, issue_text)
+        patient_index.add(row)
 
         total = len(filtered[0])
         called[0] += 1
@@ -557,6 +591,7 @@ def main():
     else:
         count_label.config(text="No outstanding patients")
 
+    check_writer()
     root.mainloop()
 
 
@@ -0,0 +1,87 @@
+"""In-memory prefix index over follow_up.csv for the Patient Callback dialog.
+
+Each searchable field is kept as a pair of parallel lists - keys sorted
+alphabetically and the row number each key came from - so a prefix lookup is
+two bisects and a slice rather than a pass over the whole file.
+"""
+import csv
+import os
+from bisect import bisect_left, bisect_right
+
+# Sorts after any character that can appear in a key, closing a prefix range
+PREFIX_END = "\uffff"
+
+
+def search_keys(row):
+    """Return (field, key) pairs a row can be found by."""
+    phone = "".join(ch for ch in row.get("phone", "") if ch.isdigit())
+    return [
+        ("mrn", row.get("mrn", "").strip()),
+        ("surname", row.get("surname", "").strip().lower()),
+        ("phone", phone),
+    ]
+
+
+class PatientIndex:
+    """Prefix index of follow-up rows by MRN, surname and phone."""
+
+    def __init__(self):
+        self.rows = []
+        self.keys = {"mrn": [], "surname": [], "phone": []}
+        self.row_ids = {"mrn": [], "surname": [], "phone": []}
+
+    @classmethod
+    def from_file(cls, filename):
+        """Build the index with one read of follow_up.csv."""
+        index = cls()
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, newline="") as f:
+                index.rows = list(csv.DictReader(f))
+
+        # Sort each field once rather than inserting row by row
+        pairs = {field: [] for field in index.keys}
+        for row_id, row in enumerate(index.rows):
+            for field, key in search_keys(row):
+                if key:
+                    pairs[field].append((key, row_id))
+        for field, field_pairs in pairs.items():
+            field_pairs.sort()
+            index.keys[field] = [key for key, row_id in field_pairs]
+            index.row_ids[field] = [row_id for key, row_id in field_pairs]
+        return index
+
+    def add(self, row):
+        """Index a row as it is written to follow_up.csv."""
+        row_id = len(self.rows)
+        self.rows.append(row)
+        for field, key in search_keys(row):
+            if not key:
+                continue
+            keys = self.keys[field]
+            position = bisect_right(keys, key)
+            keys.insert(position, key)
+            self.row_ids[field].insert(position, row_id)
+
+    def _prefix_ids(self, field, prefix):
+        keys = self.keys[field]
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + PREFIX_END, lo)
+        return self.row_ids[field][lo:hi]
+
+    def search(self, text):
+        """Return rows whose MRN, phone (digits) or surname (text) start with text.
+
+        Most recently written rows come first.
+        """
+        text = text.strip().lower()
+        if not text:
+            return []
+
+        digits = text.replace(" ", "")
+        if digits.isdigit():
+            ids = set(self._prefix_ids("mrn", digits))
+            ids.update(self._prefix_ids("phone", digits))
+        else:
+            ids = set(self._prefix_ids("surname", text))
+
+        return [self.rows[row_id] for row_id in sorted(ids, reverse=True)]
@@ -0,0 +1,93 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualList(ttk.Frame):
+    """A Listbox that only ever holds the rows currently on screen.
+
+    The full result list can be any length; scrolling just moves a window over
+    it and redraws the visible rows, so refreshing after each keystroke costs
+    the same whether there are ten matches or ten thousand.
+    """
+
+    def __init__(self, parent, height=8, width=60, on_select=None):
+        super().__init__(parent)
+        self.height = height
+        self.on_select = on_select
+        self.items = []
+        self.formatter = str
+        self.top = 0
+        self.selected_index = None
+
+        self.listbox = tk.Listbox(
+            self, height=height, width=width, activestyle="none",
+            exportselection=False, font=("TkFixedFont", 10),
+        )
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<MouseWheel>", self._on_wheel)
+        self.listbox.bind("<Button-4>", lambda e: self._scroll_by(-1))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll_by(1))
+
+    def set_items(self, items, formatter=str):
+        """Replace the result list and scroll back to the top."""
+        self.items = items
+        self.formatter = formatter
+        self.top = 0
+        self.selected_index = None
+        self._render()
+
+    def selected(self):
+        """The selected item, or None."""
+        if self.selected_index is None:
+            return None
+        return self.items[self.selected_index]
+
+    def _render(self):
+        total = len(self.items)
+        visible = self.items[self.top:self.top + self.height]
+        self.listbox.delete(0, "end")
+        for item in visible:
+            self.listbox.insert("end", self.formatter(item))
+
+        if self.selected_index is not None:
+            row = self.selected_index - self.top
+            if 0 <= row < len(visible):
+                self.listbox.selection_set(row)
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(visible)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, len(self.items) - self.height))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.top + rows)
+
+    def _on_scroll(self, action, amount, unit=None):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, units|pages)."""
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.items)))
+        elif unit == "pages":
+            self._scroll_by(int(amount) * self.height)
+        else:
+            self._scroll_by(int(amount))
+
+    def _on_wheel(self, event):
+        self._scroll_by(-1 if event.delta > 0 else 1)
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        self.selected_index = self.top + selection[0]
+        if self.on_select:
+            self.on_select(self.items[self.selected_index])
@@ -0,0 +1,243 @@
+"""Background writer for follow_up.csv.
+
+Appending a row used to open, stat and close follow_up.csv on the Tk thread
+for every patient, which stalls the window when the file lives on a slow
+network share. ResultWriter keeps one append handle open on its own thread
+and takes rows from a bounded queue instead.
+"""
+import csv
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class ResultWriter:
+    """Own follow_up.csv on a dedicated writer thread.
+
+    Appends and callback updates go through the same queue so they are applied
+    in the order they were made - an update never races the append of the row
+    it changes. Jobs that fail (share offline) are kept, in order, and
+    retried; a written row is only counted as saved once it has been flushed
+    and fsynced, and is queued again if that fails. Any error, not just a
+    share going offline, is handled that way, so a bad row can't stop the
+    thread and lose the writes behind it.
+    If stats (an analytics.FollowUpStats) is given it is updated from the same
+    thread as rows are saved.
+    """
+
+    def __init__(self, path, update_func, stats=None, maxsize=50, fsync_interval=5.0):
+        self.path = path
+        self.update_func = update_func
+        self.stats = stats
+        self.fsync_interval = fsync_interval
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.error = None
+
+        self._file = None
+        self._writer = None
+        self._fieldnames = None
+        self._retry = deque()  # (kind, payload) jobs not yet applied, oldest first
+        self._unsynced = []  # (row, call time) written but not yet fsynced
+        self._synced_size = None  # file size at the last good sync
+        self._truncate_to = None
+        self._last_sync = time.monotonic()
+        self._stop_done = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- Called from the Tk thread ---
+
+    def write_result(self, patient, answered, issue, issue_text):
+        """Queue one row: original patient data plus the follow-up fields.
+
+        Returns the row so the caller can index it without waiting for the
+        write. The writer queues its own copy, so later changes to the returned
+        row (a callback) don't alter what is appended.
+        """
+        row = dict(patient)
+        row["answered"] = answered
+        row["issue"] = issue
+        row["issue_text"] = issue_text
+        self.jobs.put(("append", (dict(row), datetime.now())))
+        return row
+
+    def update_row(self, date, mrn, issue, issue_text):
+        """Queue a callback update of an existing row (see update_followup_row)."""
+        self.jobs.put(("update", (date, mrn, issue, issue_text)))
+
+    def pending(self):
+        """Number of rows and updates not yet safely on disk."""
+        return self.jobs.qsize() + len(self._retry) + len(self._unsynced)
+
+    def close(self, timeout=30.0):
+        """Write everything still queued, fsync and close the file.
+
+        Returns the number of rows and updates that could not be saved. If
+        that is not 0 the writer keeps running and retrying, so the caller
+        can wait and close again. Never waits more than about timeout seconds,
+        and not at all if the writer thread has died.
+        """
+        if not self._thread.is_alive():
+            return self.pending()
+        self._stop_done.clear()
+        try:
+            self.jobs.put(("stop", None), timeout=timeout)
+        except queue.Full:
+            return self.pending()
+        if self._stop_done.wait(timeout) and not self.pending():
+            self._thread.join(timeout)
+        return self.pending()
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            try:
+                kind, payload = self.jobs.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._drain_retry()
+                self._sync()
+                continue
+
+            try:
+                if kind == "stop":
+                    self._drain_retry()
+                    if self._sync() and not self._retry:
+                        self._close_file()
+                        return
+                else:
+                    self._retry.append((kind, payload))
+                    self._drain_retry()
+            except Exception as e:
+                # Keep the thread alive - whatever failed is still queued
+                self.error = e
+            finally:
+                self.jobs.task_done()
+                if kind == "stop":
+                    self._stop_done.set()
+
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _drain_retry(self):
+        """Apply any jobs still waiting, oldest first, stopping at a failure."""
+        while self._retry:
+            kind, payload = self._retry[0]
+            if kind == "append":
+                row, called = payload
+                try:
+                    self._append(row)
+                except Exception as e:
+                    self._failed(e)
+                    return
+                self._unsynced.append(payload)
+            elif not self._update(payload):
+                return
+            self._retry.popleft()
+        self._saved()
+
+    def _append(self, row):
+        if self._file is None:
+            self._open(list(row.keys()))
+        self._writer.writerow(row)
+
+    def _open(self, fieldnames):
+        # Column list is worked out once per handle, not once per patient
+        if self._fieldnames is None:
+            self._fieldnames = fieldnames
+        if self._truncate_to is not None:
+            # Cut off anything half written before the last failure - those
+            # rows are being written again
+            os.truncate(self.path, self._truncate_to)
+            self._truncate_to = None
+        write_header = (
+            not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        )
+        self._file = open(self.path, "a", newline="")
+        self._synced_size = os.fstat(self._file.fileno()).st_size
+        self._writer = csv.DictWriter(self._file, fieldnames=self._fieldnames)
+        if write_header:
+            self._writer.writeheader()
+
+    def _update(self, args):
+        """Apply a callback update. Returns False (and keeps it) if it failed."""
+        # update_followup_row rewrites the whole file, so every earlier row
+        # must be on disk and our handle released first; the next append
+        # reopens it
+        if not self._sync():
+            return False
+        self._close_file()
+        try:
+            old_row = self.update_func(*args)
+        except Exception as e:
+            self.error = e
+            return False
+        if old_row is not None and self.stats is not None:
+            try:
+                self.stats.record_update(old_row, args[2])
+            except Exception:
+                pass  # the row is updated; only the counters miss it
+            self._save_stats()
+        return True
+
+    def _sync(self):
+        """Flush Python and OS buffers so written rows survive a crash.
+
+        Returns False if that failed; the rows written since the last sync
+        are then queued to be written again.
+        """
+        self._last_sync = time.monotonic()
+        if not self._unsynced:
+            self._save_stats()
+            return True
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._synced_size = os.fstat(self._file.fileno()).st_size
+        except Exception as e:
+            self._failed(e)
+            return False
+        synced, self._unsynced = self._unsynced, []
+        if self.stats is not None:
+            for row, called in synced:
+                try:
+                    self.stats.record_result(row, called)
+                except Exception:
+                    pass  # the row is saved; only the counters miss it
+        self._save_stats()
+        self._saved()
+        return True
+
+    def _failed(self, error):
+        """Drop the handle and put rows that may not have reached the disk
+        back at the front of the queue."""
+        self.error = error
+        if self._file is not None:
+            self._truncate_to = self._synced_size
+        self._close_file()
+        self._retry.extendleft(("append", payload) for payload in reversed(self._unsynced))
+        self._unsynced = []
+
+    def _saved(self):
+        if not self._retry and not self._unsynced:
+            self.error = None
+
+    def _save_stats(self):
+        if self.stats is not None and self.stats.dirty:
+            try:
+                self.stats.save()
+            except Exception:
+                pass  # counters are saved again after the next write
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._writer = None
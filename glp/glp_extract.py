@@ -1,8 +1,12 @@
-import csv
+"""Copy the day_surgery.csv rows with the GLP-1 question answered to glp.csv."""
+import sys
+from pathlib import Path
 
-with open("day_surgery.csv") as f1, open("glp.csv", "w") as f2:
-    reader = csv.reader(f1)
-    writer = csv.writer(f2)
-    for a in reader:
-        if a[12] in {"Yes", "No"}:
-            writer.writerow(a)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_filter import DAY_SURGERY_FIELDS, RowFilter, filter_csv  # noqa: E402
+
+if __name__ == "__main__":
+    glp_answered = RowFilter(DAY_SURGERY_FIELDS).isin("glp1", {"Yes", "No"})
+    written = filter_csv("day_surgery.csv", "glp.csv", glp_answered, header=False)
+    print(f"{written} rows written to glp.csv")
@@ -0,0 +1,157 @@
+"""
+Compare colonoscopy outcomes for patients on GLP-1 agonists with those not on them.
+
+glp.csv (from glp_extract.py) has the GLP-1 answer for each admission but no
+outcomes. It is small, so it is held in a dictionary keyed by (date, mrn) and
+episodes.csv is streamed past it once, picking up the caecum and polyp fields
+of each colonoscopy. Poor prep and caecal failure (obstructions excluded, as
+for the QPS caecum report) are reported overall, per endoscopist and per quarter.
+
+    python glp_outcomes.py
+"""
+import csv
+import platform
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_filter import DAY_SURGERY_FIELDS  # noqa: E402
+from dec_dates import year_quarter  # noqa: E402
+
+if platform.system() == "Windows":
+    episodes_file = r"D:\John TILLET\episode_data\episodes.csv"
+else:
+    episodes_file = "episodes.csv"
+glp_file = "glp.csv"
+report_file = "glp_outcomes.txt"
+
+GROUPS = {"Yes": "GLP-1", "No": "No GLP-1"}
+GLP_COLUMN = DAY_SURGERY_FIELDS.index("glp1")
+
+
+def outcome_template():
+    return {"colons": 0, "poor_prep": 0, "caecal_fail": 0, "polyp": 0}
+
+
+def load_glp(path=glp_file):
+    """{(date, mrn): "Yes" or "No"} from glp.csv. A later answer for the same
+    admission replaces an earlier one."""
+    answers = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) > GLP_COLUMN and row[GLP_COLUMN] in GROUPS:
+                answers[(row[0], row[1])] = row[GLP_COLUMN]
+    return answers
+
+
+def quarter_label(date_str):
+    year, month = year_quarter(date_str)
+    return f"{year} Q{month // 3}"
+
+
+def join_outcomes(answers, episodes_path=episodes_file):
+    """Stream episodes.csv once and count outcomes of the colonoscopies in answers.
+
+    Returns {"overall": {group: counts}, "endoscopist": {doctor: {group: counts}},
+    "quarter": {quarter: {group: counts}}, "unmatched": answers with no colonoscopy}.
+    """
+    overall = defaultdict(outcome_template)
+    by_doctor = defaultdict(lambda: defaultdict(outcome_template))
+    by_quarter = defaultdict(lambda: defaultdict(outcome_template))
+    matched = set()
+
+    with open(episodes_path, newline="") as f:
+        for row in csv.DictReader(f):
+            caecum = row["caecum"].strip()
+            if not caecum:
+                continue  # not a colonoscopy
+            key = (row["date"], row["mrn"])
+            answer = answers.get(key)
+            if answer is None or key in matched:
+                continue  # no GLP-1 answer, or a duplicate episode
+            matched.add(key)
+            group = GROUPS[answer]
+            for counts in (
+                overall[group],
+                by_doctor[row["endo"]][group],
+                by_quarter[quarter_label(row["date"])][group],
+            ):
+                counts["colons"] += 1
+                if caecum == "Poor Prep":
+                    counts["poor_prep"] += 1
+                if caecum not in ("success", "Obstruction"):
+                    counts["caecal_fail"] += 1
+                if row.get("polyp", "").strip():
+                    counts["polyp"] += 1
+
+    return {
+        "overall": overall,
+        "endoscopist": by_doctor,
+        "quarter": by_quarter,
+        "unmatched": len(answers) - len(matched),
+    }
+
+
+def percent(part, whole):
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+def group_cells(counts):
+    return [
+        str(counts["colons"]),
+        percent(counts["poor_prep"], counts["colons"]),
+        percent(counts["caecal_fail"], counts["colons"]),
+    ]
+
+
+def table_lines(title, rows):
+    """One line per row label with colons, poor prep % and failure % for each group."""
+    header = "".join(
+        f"{group} colons".ljust(18) + "Poor prep".ljust(12) + "Caecal fail".ljust(14)
+        for group in GROUPS.values()
+    )
+    lines = [title, "", "".ljust(22) + header]
+    for label in sorted(rows):
+        cells = []
+        for group in GROUPS.values():
+            colons, poor_prep, caecal_fail = group_cells(rows[label][group])
+            cells.append(colons.ljust(18) + poor_prep.ljust(12) + caecal_fail.ljust(14))
+        lines.append(str(label).ljust(22) + "".join(cells))
+    return lines
+
+
+def report_lines(results):
+    lines = ["GLP-1 AGONISTS AND COLONOSCOPY OUTCOMES", ""]
+    for group in GROUPS.values():
+        counts = results["overall"][group]
+        lines.append(
+            f"{group.ljust(10)} colonoscopies: {str(counts['colons']).ljust(8)}"
+            f"poor prep: {percent(counts['poor_prep'], counts['colons']).ljust(8)}"
+            f"caecal failure: {percent(counts['caecal_fail'], counts['colons']).ljust(8)}"
+            f"polyp recorded: {percent(counts['polyp'], counts['colons'])}"
+        )
+    lines.append(f"GLP-1 answers with no colonoscopy in episodes.csv: {results['unmatched']}")
+    lines.append("")
+    lines += table_lines("BY ENDOSCOPIST", results["endoscopist"])
+    lines.append("")
+    lines += table_lines("BY QUARTER", results["quarter"])
+    return lines
+
+
+def write_report(results, path=report_file):
+    with open(path, "w") as file:
+        file.write("\n".join(report_lines(results)) + "\n")
+
+
+def main():
+    answers = load_glp()
+    results = join_outcomes(answers)
+    write_report(results)
+    print("\n".join(report_lines(results)[:5]))
+    print(f"Report written to {report_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Run the quarterly QA reports without any prompts.
+
+Writes the caecum, repeat procedure and dilatation reports for every quarter
+in a range into one output folder, running the reports side by side in a
+process pool. Nothing is opened afterwards, so this can run from a scheduler.
+
+    python qa_batch.py 2024Q1 2025Q4 --out reports
+    python qa_batch.py 2025 --reports caecum repeats
+
+A bare year means all four quarters of it. Dilatation counts are half-yearly,
+so they are written for each half-year that ends inside the range.
+"""
+import argparse
+import os
+import platform
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+for folder in ("caecum", "repeat_procedures", "dilatations"):
+    sys.path.insert(0, str(ROOT / folder))
+
+import caecum  # noqa: E402
+import dilatation_counter  # noqa: E402
+import repeat_procedures  # noqa: E402
+
+if platform.system() == "Windows":
+    data_base = Path("d:/john tillet/episode_data/")
+else:
+    data_base = Path(".")
+
+REPORTS = ["caecum", "repeats", "dilatations"]
+
+
+def parse_quarter(text):
+    """argparse type: '2025Q2' -> ('2025', 2), a bare year '2025' -> ('2025', None)."""
+    year, q, quarter = text.upper().partition("Q")
+    if not (year.isdigit() and len(year) == 4) or (q and quarter not in ("1", "2", "3", "4")):
+        raise argparse.ArgumentTypeError(f"{text} is not a year or a quarter like 2025Q2")
+    return year, int(quarter) if q else None
+
+
+def quarter_month(parsed, end=False):
+    """(year, quarter) -> (year, last month of the quarter). A bare year gives
+    its first quarter, or its last if end is True."""
+    year, quarter = parsed
+    if quarter is None:
+        quarter = 4 if end else 1
+    return year, quarter * 3
+
+
+def quarter_range(first, last):
+    """Every (year, month) quarter from first to last inclusive."""
+    periods = []
+    year, month = int(first[0]), first[1]
+    while (year, month) <= (int(last[0]), last[1]):
+        periods.append((str(year), month))
+        month += 3
+        if month > 12:
+            year, month = year + 1, 3
+    return periods
+
+
+def run_caecum(episodes_file, periods, out_dir):
+    """All caecum quarters come from one pass, so they are one job."""
+    caecum.data_file = episodes_file
+    caecum.main_many(periods, out_dir)
+    return f"caecum: {len(periods)} quarters"
+
+
+def run_repeats(day_surgery_file, year, month, out_dir):
+    report_path = Path(out_dir) / f"repeats_{year}_{month:02d}.txt"
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    repeat_procedures.main(year, month, day_surgery_file, report_path)
+    return f"repeats: {month:02d}/{year}"
+
+
+def run_dilatations(episodes_file, year, month, out_dir):
+    period_name, start_month, end_month = dilatation_counter.periods["1" if month == 6 else "2"]
+    results = dilatation_counter.count_procedures(episodes_file, year, start_month, end_month)
+    report_path = Path(out_dir) / f"dilatations_{year}_H{1 if month == 6 else 2}.txt"
+    dilatation_counter.write_report(period_name, year, results, report_path)
+    return f"dilatations: {period_name} {year}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write quarterly QA reports without prompts.")
+    parser.add_argument("first", type=parse_quarter, help="first quarter, e.g. 2024Q1, or a year")
+    parser.add_argument(
+        "last", type=parse_quarter, nargs="?", help="last quarter or year (default: same as first)"
+    )
+    parser.add_argument("--out", default="qa_reports", help="folder for the report files")
+    parser.add_argument("--episodes", default=str(data_base / "episodes.csv"))
+    parser.add_argument("--day-surgery", default=str(data_base / "day_surgery.csv"))
+    parser.add_argument("--reports", nargs="+", choices=REPORTS, default=REPORTS)
+    parser.add_argument("--workers", type=int, default=None, help="processes to use")
+    args = parser.parse_args(argv)
+
+    first = quarter_month(args.first)
+    last = quarter_month(args.last or args.first, end=True)
+    periods = quarter_range(first, last)
+    if not periods:
+        parser.error("the first quarter is after the last")
+    os.makedirs(args.out, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = []
+        if "caecum" in args.reports:
+            jobs.append(pool.submit(run_caecum, args.episodes, periods, args.out))
+        for year, month in periods:
+            if "repeats" in args.reports:
+                jobs.append(pool.submit(run_repeats, args.day_surgery, year, month, args.out))
+            if "dilatations" in args.reports and month in (6, 12):
+                jobs.append(pool.submit(run_dilatations, args.episodes, year, month, args.out))
+
+        failed = 0
+        for job in as_completed(jobs):
+            try:
+                print(f"Done {job.result()}")
+            except Exception as e:
+                failed += 1
+                print(f"FAILED: {e!r}")
+
+    print(f"Reports written to {Path(args.out).resolve()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Recall list of patients due for surveillance, from the p_recall and c_recall
+columns of episodes.csv.
+
+Each patient's polyp and colon recall come from their latest episode, so a
+later episode with nothing in that column clears an earlier recall - the
+patient has been seen. A recall is a number of years ("3", "5 years",
+"1.5"), months ("6 months", "18m") or a due date (DD-MM-YYYY); "no" or "none"
+cancels an earlier recall. An entry that can't be read ("3-5 years") leaves
+the earlier recall in place and is listed under the report to be fixed.
+
+The recalls are kept in recall.json, topped up from episodes.csv with
+csv_tail.py, and held in due date order so a month's list is a slice of it.
+
+    python recall.py                     due this month
+    python recall.py --month 11-2025     due in November 2025
+    python recall.py --overdue 90        more than 90 days overdue
+"""
+import argparse
+import calendar
+import json
+import os
+import platform
+import re
+import sys
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_tail import CsvTail  # noqa: E402
+from dec_dates import day_ordinal  # noqa: E402
+
+if platform.system() == "Windows":
+    episodes_file = r"D:\John TILLET\episode_data\episodes.csv"
+else:
+    episodes_file = "episodes.csv"
+recall_file = "recall.json"
+
+RECALL_COLUMNS = {"polyp": "p_recall", "colon": "c_recall"}
+CANCELLED = {"no", "none", "nil", "0", "n/a", "na"}
+CANCEL = -1  # parse_recall result for an entry that cancels the recall
+
+# Recalls are stored as lists to keep the json small
+EPISODE_DAY, DUE_DAY, ENDOSCOPIST, SURNAME, FIRSTNAME = range(5)
+
+interval_pattern = re.compile(r"^(\d+(?:\.\d+)?)\s*(y|yr|yrs|years?|m|mo|months?)?$")
+
+
+def add_months(d, months):
+    """d plus a whole number of months, keeping to the end of short months."""
+    month_index = d.month - 1 + months
+    year, month = d.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def parse_recall(value, episode_day):
+    """Due day number for a recall entry, CANCEL if it cancels the recall, or
+    None if there is nothing (or nothing readable) in it."""
+    value = value.strip().lower()
+    if not value:
+        return None
+    if value in CANCELLED:
+        return CANCEL
+    try:
+        return day_ordinal(value)
+    except ValueError:
+        pass
+    match = interval_pattern.match(value)
+    if not match:
+        return None
+    number, unit = float(match.group(1)), match.group(2) or "y"
+    months = round(number if unit.startswith("m") else number * 12)
+    return add_months(date.fromordinal(episode_day), months).toordinal()
+
+
+class RecallQueue:
+    """Latest recall per (mrn, kind), with an index sorted by due day."""
+
+    def __init__(self, path=recall_file, csv_path=episodes_file):
+        self.path = path
+        self.csv_path = csv_path
+        self.recalls = {}  # mrn -> {kind: [episode day, due day, endoscopist, surname, firstname]}
+        self.due_index = []  # sorted (due day, mrn, kind)
+        self.tail_state = None
+        self.unreadable = []  # (mrn, date, entry) for entries that couldn't be read
+
+    @classmethod
+    def load(cls, path=recall_file, csv_path=episodes_file):
+        """Load the saved recalls and bring them up to date with episodes.csv."""
+        queue = cls(path, csv_path)
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            # An older save only counted unreadable entries (and let them
+            # clear a recall), so it is rebuilt from episodes.csv
+            if isinstance(saved.get("unreadable"), list):
+                queue.recalls = saved["recalls"]
+                queue.tail_state = saved["tail"]
+                queue.unreadable = [tuple(entry) for entry in saved["unreadable"]]
+                queue.due_index = sorted(
+                    (recall[DUE_DAY], mrn, kind)
+                    for mrn, kinds in queue.recalls.items()
+                    for kind, recall in kinds.items()
+                )
+        if queue.update():
+            queue.save()
+        return queue
+
+    def update(self):
+        """Read any rows appended to episodes.csv. Returns the number read."""
+        tail = CsvTail(self.csv_path, self.tail_state)
+        if tail.replaced():
+            self.recalls, self.due_index, self.unreadable = {}, [], []
+        added = 0
+        for row in tail.rows():
+            self.add(row)
+            added += 1
+        self.tail_state = tail.state
+        return added
+
+    def add(self, row):
+        try:
+            episode_day = day_ordinal(row["date"])
+        except ValueError:
+            return
+        mrn = row["mrn"]
+        for kind, column in RECALL_COLUMNS.items():
+            value = (row.get(column) or "").strip()
+            due = parse_recall(value, episode_day)
+            if due is None and value:
+                self.unreadable.append((mrn, row["date"], value))
+                continue  # keep the earlier recall rather than lose the patient
+            current = self.recalls.get(mrn, {}).get(kind)
+            if current is not None:
+                if current[EPISODE_DAY] > episode_day:
+                    continue  # an older episode added late
+                if current[EPISODE_DAY] == episode_day and due is None:
+                    continue  # another row for the same day without a recall
+                self._unindex(current[DUE_DAY], mrn, kind)
+                del self.recalls[mrn][kind]
+                if not self.recalls[mrn]:
+                    del self.recalls[mrn]
+            if due is None or due == CANCEL:
+                continue
+            self.recalls.setdefault(mrn, {})[kind] = [
+                episode_day, due, row["endo"], row.get("surname", ""), row.get("firstname", ""),
+            ]
+            insort(self.due_index, (due, mrn, kind))
+
+    def _unindex(self, due, mrn, kind):
+        position = bisect_left(self.due_index, (due, mrn, kind))
+        if position < len(self.due_index) and self.due_index[position] == (due, mrn, kind):
+            del self.due_index[position]
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {"tail": self.tail_state, "unreadable": self.unreadable, "recalls": self.recalls},
+                f,
+            )
+        os.replace(temp_path, self.path)
+
+    def due_between(self, start, end):
+        """[(due day, mrn, kind)] due from start to end (dates) inclusive, earliest first."""
+        low = bisect_left(self.due_index, (start.toordinal(),))
+        high = bisect_right(self.due_index, (end.toordinal(), chr(0x10FFFF)))
+        return self.due_index[low:high]
+
+    def overdue(self, today, days=0):
+        """[(due day, mrn, kind)] due more than days before today, earliest first."""
+        high = bisect_left(self.due_index, ((today - timedelta(days=days)).toordinal(),))
+        return self.due_index[:high]
+
+    def recall(self, mrn, kind):
+        return self.recalls[mrn][kind]
+
+
+def recall_lines(queue, entries):
+    lines = [
+        "Due".ljust(12) + "MRN".ljust(10) + "Name".ljust(30) + "Recall".ljust(8)
+        + "Last seen".ljust(12) + "Endoscopist"
+    ]
+    for due, mrn, kind in entries:
+        recall = queue.recall(mrn, kind)
+        name = f"{recall[SURNAME]}, {recall[FIRSTNAME]}".strip(", ")
+        lines.append(
+            date.fromordinal(due).strftime("%d-%m-%Y").ljust(12)
+            + mrn.ljust(10)
+            + name.ljust(30)
+            + kind.ljust(8)
+            + date.fromordinal(recall[EPISODE_DAY]).strftime("%d-%m-%Y").ljust(12)
+            + recall[ENDOSCOPIST]
+        )
+    lines.append(f"{len(entries)} recalls")
+    return lines
+
+
+def unreadable_lines(unreadable):
+    """Entries that couldn't be read, by MRN, so they can be corrected."""
+    lines = ["MRN".ljust(10) + "Date".ljust(12) + "Entry"]
+    for mrn, episode_date, value in sorted(unreadable):
+        lines.append(mrn.ljust(10) + episode_date.ljust(12) + value)
+    return lines
+
+
+def month_year(text):
+    """argparse type: 'MM-YYYY' -> (month, year)."""
+    month, _, year = text.partition("-")
+    if not (month.isdigit() and 1 <= int(month) <= 12 and year.isdigit() and len(year) == 4):
+        raise argparse.ArgumentTypeError(f"{text} is not a month like 11-2025")
+    return int(month), int(year)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Patients due for surveillance")
+    parser.add_argument("--month", type=month_year, help="MM-YYYY, default this month")
+    parser.add_argument("--overdue", type=int, metavar="DAYS", help="overdue by more than DAYS")
+    args = parser.parse_args(argv)
+
+    queue = RecallQueue.load()
+    today = date.today()
+    if args.overdue is not None:
+        entries = queue.overdue(today, args.overdue)
+        title = f"RECALLS OVERDUE BY MORE THAN {args.overdue} DAYS AT {today.strftime('%d-%m-%Y')}"
+    else:
+        if args.month:
+            month, year = args.month
+        else:
+            month, year = today.month, today.year
+        start = date(year, month, 1)
+        end = date(year, month, calendar.monthrange(year, month)[1])
+        entries = queue.due_between(start, end)
+        title = f"RECALLS DUE {start.strftime('%B %Y').upper()}"
+
+    print(title)
+    print()
+    print("\n".join(recall_lines(queue, entries)))
+    if queue.unreadable:
+        print()
+        print(f"Recall entries that couldn't be read: {len(queue.unreadable)}")
+        print("\n".join(unreadable_lines(queue.unreadable)))
+
+
+if __name__ == "__main__":
+    main()
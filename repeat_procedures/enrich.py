@@ -0,0 +1,125 @@
+"""
+Add episodes.csv and follow_up.csv details to repeat procedures.
+
+Repeats come from day_surgery.csv, which has no caecum, polyp or follow-up
+information. The repeats are few, so their (date, mrn) keys are held in a
+dictionary and episodes.csv and follow_up.csv are each streamed past it once.
+That answers questions like "was the repeat preceded by a Poor Prep caecum
+failure, or by a follow-up call that found an issue?"
+
+    python enrich.py 2025 6      repeats for the quarter ending June 2025
+"""
+import csv
+import sys
+from collections import Counter
+
+from repeat_procedures import collect_admissions, csv_file, find_repeats, quarter_window
+
+# These are the production file paths - uncomment in production
+
+# episodes_file = "D:/JOHN TILLET/episode_data/episodes.csv"
+# followup_file = "D:/john tillet/source/active/follow_up/follow_up.csv"
+
+episodes_file = "episodes.csv"
+followup_file = "follow_up.csv"
+enriched_file = "repeats_enriched.csv"
+
+EPISODE_FIELDS = ["caecum", "polyp"]
+FOLLOWUP_FIELDS = ["answered", "issue", "issue_text"]
+
+enriched_headers = (
+    ["mrn", "endoscopist", "first_date", "first_upper", "first_colon",
+     "second_date", "second_upper", "second_colon"]
+    + [f"first_{field}" for field in EPISODE_FIELDS]
+    + [f"second_{field}" for field in EPISODE_FIELDS]
+    + [f"followup_{field}" for field in FOLLOWUP_FIELDS]
+)
+
+
+def stream_join(filename, keys, fields):
+    """Stream a csv file with a header and return {(date, mrn): {field: value}}
+    for the rows whose key is in keys. Later rows win if a key repeats."""
+    found = {}
+    try:
+        with open(filename, newline="") as f:
+            for row in csv.DictReader(f):
+                key = (row["date"], row["mrn"])
+                if key in keys:
+                    found[key] = {field: row.get(field, "") for field in fields}
+    except FileNotFoundError:
+        print(f"{filename} not found - those columns will be blank")
+    return found
+
+
+def enrich(repeats, episodes_path=episodes_file, followup_path=followup_file):
+    """Return one dict per (first, second) repeat pair with the joined details."""
+    first_keys = {(first["date"], first["mrn"]) for first, second in repeats}
+    second_keys = {(second["date"], second["mrn"]) for first, second in repeats}
+
+    episodes = stream_join(episodes_path, first_keys | second_keys, EPISODE_FIELDS)
+    followups = stream_join(followup_path, first_keys, FOLLOWUP_FIELDS)
+
+    records = []
+    blank_episode = dict.fromkeys(EPISODE_FIELDS, "")
+    blank_followup = dict.fromkeys(FOLLOWUP_FIELDS, "")
+    for first, second in repeats:
+        first_key = (first["date"], first["mrn"])
+        second_key = (second["date"], second["mrn"])
+        record = {
+            "mrn": first["mrn"],
+            "endoscopist": first["endoscopist"],
+            "first_date": first["date"],
+            "first_upper": first["upper"],
+            "first_colon": first["colon"],
+            "second_date": second["date"],
+            "second_upper": second["upper"],
+            "second_colon": second["colon"],
+        }
+        for field, value in episodes.get(first_key, blank_episode).items():
+            record[f"first_{field}"] = value
+        for field, value in episodes.get(second_key, blank_episode).items():
+            record[f"second_{field}"] = value
+        for field, value in followups.get(first_key, blank_followup).items():
+            record[f"followup_{field}"] = value
+        records.append(record)
+    return records
+
+
+def summarise(records):
+    """Count what preceded the repeats."""
+    counts = Counter()
+    for record in records:
+        caecum = record["first_caecum"]
+        if caecum == "Poor Prep":
+            counts["poor_prep"] += 1
+        elif caecum and caecum != "success":
+            counts["other_caecum_failure"] += 1
+        if record["followup_issue"] == "yes":
+            counts["followup_issue"] += 1
+    return counts
+
+
+def write_enriched(records, path=enriched_file):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=enriched_headers)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main(year, month, csv_path=csv_file, path=enriched_file):
+    start, end = quarter_window(year, month)
+    mrn_to_episodes, total_procedures = collect_admissions(csv_path, start, end)
+    repeats = find_repeats(mrn_to_episodes, start.toordinal())
+    records = enrich(repeats)
+    write_enriched(records, path)
+
+    counts = summarise(records)
+    print(f"Repeats in the 3 months up to {month}/{year}: {len(records)}")
+    print(f"Preceded by a Poor Prep caecum failure:  {counts['poor_prep']}")
+    print(f"Preceded by another caecum failure:  {counts['other_caecum_failure']}")
+    print(f"Preceded by a follow-up issue:  {counts['followup_issue']}")
+    print(f"Details written to {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]))
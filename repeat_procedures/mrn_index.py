@@ -0,0 +1,204 @@
+"""
+Persistent index of every admission in day_surgery.csv, grouped by mrn.
+
+The index is saved to mrn_index.json and read on from where it stopped (see
+csv_tail.py). From it, repeat procedures for any date range and any window
+can be found in one query without rereading the file.
+
+    python mrn_index.py 2021 2025                   trend table for 5 years
+    python mrn_index.py 2025 2025 --endo "Dr A Stoita"   list one doctor's repeats
+
+A repeat is credited to the endoscopist of the first admission.
+"""
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_tail import CsvTail  # noqa: E402
+from dec_dates import day_ordinal  # noqa: E402
+from repeat_procedures import (  # noqa: E402
+    REPEAT_WINDOW,
+    csv_file,
+    headers,
+    is_split_procedure,
+    pairs_within,
+    procedure_names,
+)
+
+index_file = "mrn_index.json"
+trend_file = "repeats_trend.txt"
+
+# Admissions are stored as lists to keep the json small
+DAY, ENDOSCOPIST, UPPER, COLON, PROCEDURES = range(5)
+INDEX_VERSION = 2  # saved indexes from an older layout are rebuilt
+
+
+def quarter_label(day):
+    d = date.fromordinal(day)
+    return f"{d.year} Q{(d.month - 1) // 3 + 1}"
+
+
+class MrnIndex:
+    """mrn -> admissions sorted by day, one admission per day.
+
+    Each admission also keeps the number of procedures on every row for that
+    day, duplicates included, so totals match the quarterly QPS report.
+    """
+
+    def __init__(self, index_path=index_file, csv_path=csv_file):
+        self.index_path = index_path
+        self.csv_path = csv_path
+        self.admissions = {}
+        self.tail_state = None
+
+    @classmethod
+    def load(cls, index_path=index_file, csv_path=csv_file):
+        """Load the saved index and bring it up to date with day_surgery.csv."""
+        index = cls(index_path, csv_path)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                saved = json.load(f)
+            if saved.get("version") == INDEX_VERSION:
+                index.admissions = saved["admissions"]
+                index.tail_state = saved["tail"]
+        if index.update():
+            index.save()
+        return index
+
+    def update(self):
+        """Add any rows appended to day_surgery.csv. Returns the number read."""
+        tail = CsvTail(self.csv_path, self.tail_state, fieldnames=headers)
+        if tail.replaced():
+            self.admissions = {}
+        added = 0
+        for episode in tail.rows():
+            self.add(episode)
+            added += 1
+        self.tail_state = tail.state
+        return added
+
+    def add(self, episode):
+        """Index one day_surgery.csv row. A same-day duplicate only adds its
+        procedures to the admission already indexed."""
+        day = day_ordinal(episode["date"])
+        procedures = bool(episode["upper"]) + bool(episode["colon"])
+        admissions = self.admissions.setdefault(episode["mrn"], [])
+        position = bisect_left(admissions, [day])
+        if position < len(admissions) and admissions[position][DAY] == day:
+            admissions[position][PROCEDURES] += procedures
+            return
+        upper, colon = procedure_names(episode)
+        insort(admissions, [day, episode["endoscopist"], upper, colon, procedures])
+
+    def save(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {"version": INDEX_VERSION, "tail": self.tail_state, "admissions": self.admissions},
+                f,
+            )
+        os.replace(temp_path, self.index_path)
+
+    def repeats(self, start=None, end=None, window=REPEAT_WINDOW, endoscopist=None):
+        """Yield (mrn, first, second) for every pair of admissions less than
+        window days apart whose second admission is between start and end
+        (dates, either may be None). endoscopist limits to their first admissions.
+        """
+        start_day = start.toordinal() if start else 0
+        end_day = end.toordinal() if end else date.max.toordinal()
+        for mrn, admissions in self.admissions.items():
+            if len(admissions) < 2 or admissions[-1][DAY] < start_day:
+                continue
+            days = [admission[DAY] for admission in admissions]
+            for i, j in pairs_within(days, window):
+                first, second = admissions[i], admissions[j]
+                if not start_day <= second[DAY] <= end_day:
+                    continue
+                if endoscopist and first[ENDOSCOPIST] != endoscopist:
+                    continue
+                if is_split_procedure(as_dict(first), as_dict(second)):
+                    continue
+                yield mrn, first, second
+
+    def procedures(self, start=None, end=None):
+        """Procedures per (endoscopist, quarter) between start and end, counted
+        over every row as collect_admissions counts them."""
+        start_day = start.toordinal() if start else 0
+        end_day = end.toordinal() if end else date.max.toordinal()
+        counts = defaultdict(int)
+        for admissions in self.admissions.values():
+            for admission in admissions:
+                if start_day <= admission[DAY] <= end_day:
+                    key = (admission[ENDOSCOPIST], quarter_label(admission[DAY]))
+                    counts[key] += admission[PROCEDURES]
+        return counts
+
+    def trend(self, start=None, end=None, window=REPEAT_WINDOW):
+        """Repeats per (endoscopist, quarter of the second admission)."""
+        counts = defaultdict(int)
+        for mrn, first, second in self.repeats(start, end, window):
+            counts[(first[ENDOSCOPIST], quarter_label(second[DAY]))] += 1
+        return counts
+
+
+def as_dict(admission):
+    return {"upper": admission[UPPER], "colon": admission[COLON]}
+
+
+def write_trend(index, start, end, window, path=trend_file):
+    """Write an endoscopist x quarter table of repeats / procedures."""
+    repeats = index.trend(start, end, window)
+    procedures = index.procedures(start, end)
+    quarters = sorted({quarter for _, quarter in procedures})
+    doctors = sorted({doctor for doctor, _ in procedures})
+
+    with open(path, "w") as file:
+        file.write(
+            f"REPEAT PROCEDURES WITHIN {window} DAYS (REPEATS/PROCEDURES) "
+            f"FROM {start.strftime('%d-%m-%Y')} TO {end.strftime('%d-%m-%Y')}\n\n"
+        )
+        file.write("Doctor".ljust(25) + "".join(q.ljust(12) for q in quarters) + "\n\n")
+        for doctor in doctors:
+            cells = [
+                f"{repeats[(doctor, q)]}/{procedures[(doctor, q)]}" for q in quarters
+            ]
+            file.write(doctor.ljust(25) + "".join(c.ljust(12) for c in cells) + "\n")
+    print(f"Trend written to {path}")
+
+
+def print_repeats(index, start, end, window, endoscopist):
+    """List one endoscopist's repeats in the same layout as the quarterly report."""
+    total = 0
+    for mrn, first, second in sorted(
+        index.repeats(start, end, window, endoscopist), key=lambda r: r[2][DAY]
+    ):
+        for k, admission in enumerate((first, second)):
+            when = date.fromordinal(admission[DAY]).strftime("%d-%m-%Y")
+            name = mrn if k == 0 else ""
+            print(f"{name.ljust(10)} {when.ljust(12)} {admission[UPPER].ljust(10)} {admission[COLON].ljust(10)}")
+        print()
+        total += 1
+    print(f"Number of repeats for {endoscopist}: {total}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Repeat procedures across all of day_surgery.csv")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int)
+    parser.add_argument("--window", type=int, default=REPEAT_WINDOW, help="days")
+    parser.add_argument("--endo", help="list the repeats for one endoscopist")
+    args = parser.parse_args()
+
+    index = MrnIndex.load()
+    start, end = date(args.first_year, 1, 1), date(args.last_year, 12, 31)
+    if args.endo:
+        print_repeats(index, start, end, args.window, args.endo)
+    else:
+        write_trend(index, start, end, args.window)
@@ -2,15 +2,21 @@
 Looks for all  pat_to_procedure that were repeated within  month
 where the last one was done in the last 3 month.
 Survey to be done end of March, June, September and December.
-Actually need to look back 4 months to find all cases.
+Admissions up to 31 days before the quarter starts are read as well so
+repeats of procedures done just before the quarter are found.
 """
+import calendar
 import csv
 from collections import defaultdict
 import os
-from datetime import datetime
-from itertools import chain
+import sys
+from datetime import date
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dec_dates import day_ordinal  # noqa: E402
+
 headers = [
     "date",
     "mrn",
@@ -43,168 +49,183 @@ text_file = "repeats.txt"
 #  also uncomment the os.startfile near the end in production
 
 
-def is_within_31_days(date_string_1, date_string_2):
-    date_object_1 = datetime.strptime(date_string_1, "%d-%m-%Y")
-    date_object_2 = datetime.strptime(date_string_2, "%d-%m-%Y")
-    difference = abs((date_object_2 - date_object_1).days)
-    return difference < 31
+REPEAT_WINDOW = 31  # days
+
 
+def pairs_within(days, window=REPEAT_WINDOW):
+    """Yield every (i, j), i < j, of a sorted list of day numbers less than window days apart.
+
+    Two pointers: start trails j and only ever moves forward, so the whole
+    list is walked once plus one step per pair found.
+    """
+    start = 0
+    for j, day in enumerate(days):
+        while day - days[start] >= window:
+            start += 1
+        for i in range(start, j):
+            yield i, j
 
-def stringify(month):
-    """Change int to a string and add a leading 0 to month"""
-    if month < 10:
-        month = "0" + str(month)
-    else:
-        month = str(month)
-    return month
 
+def procedure_names(episode):
+    """Return the report names for a row's upper and colon item codes."""
+    upper = "upper" if episode["upper"] else ""
+    colon = episode["colon"]
+    if colon[0:3] == "320":
+        colon = "short colon"
+    if colon[0:3] == "322":
+        colon = "long colon"
+    return upper, colon
 
-def dates_finder(month):
-    """March is special case.
-    Use a flag to tell main that we need to
-    look in final months of previous year.
+
+def is_split_procedure(first, second):
+    """True when one admission was upper only and the other colon only.
+
+    That is a planned split of the procedures, not a repeat.
     """
-    z = month - 3
-    a = month - 2
-    b = month - 1
-    c = month
-    flip_flag = False
-    if c == 3:
-        z = 12
-        flip_flag = True
-
-    month_set = {
-        "a": stringify(a),
-        "b": stringify(b),
-        "c": stringify(c),
-        "z": stringify(z),
+    return "" in {first["upper"], second["upper"]} and "" in {
+        first["colon"],
+        second["colon"],
     }
 
-    reduced_month_set = {"a": stringify(a), "b": stringify(b), "c": stringify(c)}
 
-    return month_set, reduced_month_set, flip_flag
+def quarter_window(year, month):
+    """Return the first and last date of the quarter ending in month."""
+    year = int(year)
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month - 2, 1), date(year, month, last_day)
 
 
-def main(year, month):  # year is str, month is int
-    """First - check through day_surgery.csv for admissions in the previos 4 months.
-    Out of those build a dictionary mapping mrn to a list of admissions
-    Second - check through that dictionary to find patients(mrns) that have had
-    more than one admission within 31 days. Exclude those whose second admission was
-    within the 4th month previous.
-    Third - Count the total number of procedures in reporting period
-    Fourth - wrie those patient's data to a report file"""
-    month_set, reduced_month_set, flip_flag = dates_finder(month)
+def collect_admissions(csv_path, start, end, window=REPEAT_WINDOW):
+    """Read day_surgery.csv once for the reporting window start..end (dates).
+
+    Returns a dictionary mapping mrn to a list of admissions from window days
+    before start up to end (one per day), and the number of procedures done
+    from start to end. The window can be any length and cross a year end.
+    """
+    start_day = start.toordinal()
+    end_day = end.toordinal()
+    look_back_day = start_day - window
+    # Cheap string check on the year before parsing the whole date
+    first_year = str(date.fromordinal(look_back_day).year)
+    last_year = str(end.year)
+
     mrn_to_episodes = defaultdict(list)
-    repeat_patients = 0
+    seen = set()
     total_procedures = 0
-    with open(csv_file) as file:
+    with open(csv_path) as file:
         reader = csv.DictReader(file, fieldnames=headers)
         for episode in reader:
-            if (
-                (
-                    not flip_flag
-                    and episode["date"][6:10] == year
-                    and episode["date"][3:5] in month_set.values()
-                )
-                or (
-                    flip_flag
-                    and episode["date"][6:10] == str(int(year) - 1)
-                    and episode["date"][3:5] == "12"
-                )
-                or (
-                    flip_flag
-                    and episode["date"][6:10] == year
-                    and episode["date"][3:5] in reduced_month_set.values()
-                )
-            ):
-                mrn = episode["mrn"]
+            if not first_year <= episode["date"][6:10] <= last_year:
+                continue
+            day = day_ordinal(episode["date"])
+            if not look_back_day <= day <= end_day:
+                continue
+
+            if day >= start_day:
                 if episode["upper"]:
-                    episode["upper"] = "upper"
-                if episode["colon"][0:3] == "320":
-                    episode["colon"] = "short colon"
-                if episode["colon"][0:3] == "322":
-                    episode["colon"] = "long colon"
+                    total_procedures += 1
+                if episode["colon"]:
+                    total_procedures += 1
+
+            mrn = episode["mrn"]
+            # day_surgery.csv has duplicate rows - keep one admission per day
+            if (mrn, episode["date"]) in seen:
+                continue
+            seen.add((mrn, episode["date"]))
 
-                data = {
+            upper, colon = procedure_names(episode)
+            mrn_to_episodes[mrn].append(
+                {
                     "mrn": episode["mrn"],
                     "date": episode["date"],
+                    "day": day,
                     "endoscopist": episode["endoscopist"],
-                    "upper": episode["upper"],
-                    "colon": episode["colon"],
+                    "upper": upper,
+                    "colon": colon,
                 }
+            )
+
+    return mrn_to_episodes, total_procedures
+
 
-                if mrn not in mrn_to_episodes:
-                    mrn_to_episodes[mrn].append(data)
+def find_repeats(mrn_to_episodes, start_day, window=REPEAT_WINDOW):
+    """Return every (first, second) pair of admissions less than window days apart
+    where the second admission is on or after start_day."""
+    repeats = []
+    for mrn, list_of_admissions in mrn_to_episodes.items():
+        if len(list_of_admissions) < 2:
+            continue
+        list_of_admissions.sort(key=lambda admission: admission["day"])
+        days = [admission["day"] for admission in list_of_admissions]
+        for i, j in pairs_within(days, window):
+            first = list_of_admissions[i]
+            second = list_of_admissions[j]
+            if second["day"] < start_day:
+                continue
+            if is_split_procedure(first, second):
+                continue
+            repeats.append((first, second))
+    return repeats
+
+
+def repeat_patients(repeats):
+    """Number of patients with at least one repeat (a patient can be in several pairs)."""
+    return len({first["mrn"] for first, second in repeats})
+
+
+def write_report(title, repeats, total_procedures, report_path):
+    """Print the repeats and add them to the report file.
+
+    "Number of repeats" counts patients, as the QPS report always has; each
+    pair of admissions is listed and counted separately below it.
+    """
+    patients = repeat_patients(repeats)
+    with open(report_path, "a") as file:
+        file.write(f"{title}\n\n")
+        for first, second in repeats:
+            for k, admission in enumerate((first, second)):
+                if k == 0:
+                    result_string = f"{admission['mrn'].ljust(10)} {admission['date'].ljust(12)} {admission['endoscopist'].ljust(25)} {admission['upper'].ljust(10)} {admission['colon'].ljust(10)}"
                 else:
-                    flat_info = list(
-                        chain.from_iterable(d.values() for d in mrn_to_episodes[mrn])
-                    )
-                    if (
-                        data["date"] not in flat_info
-                    ):  # the above excludes duplicates that are in day_surgery.csv
-                        mrn_to_episodes[mrn].append(data)
-
-    with open(csv_file) as file:
-        reader = csv.DictReader(file, fieldnames=headers)
-        for episode in reader:
-            if (
-                episode["date"][6:10] == year
-                and episode["date"][3:5] in reduced_month_set.values()
-            ):
-                if episode["upper"]:
-                    total_procedures += 1
-                if episode["colon"]:
-                    total_procedures += 1
+                    result_string = f"{''.ljust(10)} {admission['date'].ljust(12)} {''.ljust(25)} {admission['upper'].ljust(10)} {admission['colon'].ljust(10)}"
 
-    with open(text_file, "a") as file:
-        file.write(
-            f"QPS REPORT ON REPEAT PROCEDUES IN THE 3 MONTHS UP TO {str(month)}/{year}\n\n"
-        )
-        for (
-            mrn,
-            list_of_admissions,
-        ) in mrn_to_episodes.items():
-            if (
-                len(list_of_admissions) > 1
-                and list_of_admissions[1]["date"][3:5] != month_set["z"]
-                and (
-                    is_within_31_days(
-                        list_of_admissions[0]["date"], list_of_admissions[1]["date"]
-                    )
-                )
-                and not (
-                    (
-                        ""
-                        in {
-                            list_of_admissions[0]["upper"],
-                            list_of_admissions[1]["upper"],
-                        }
-                    )
-                    and (
-                        ""
-                        in {
-                            list_of_admissions[0]["colon"],
-                            list_of_admissions[1]["colon"],
-                        }
-                    )
-                )  # this excludes where the repeated admissions was one for upper and one for colon.
-            ):
-                for i, admission in enumerate(list_of_admissions):
-                    if i == 0:
-                        result_string = f"{admission['mrn'].ljust(10)} {admission['date'].ljust(12)} {admission['endoscopist'].ljust(25)} {admission['upper'].ljust(10)} {admission['colon'].ljust(10)}"
-                    else:
-                        result_string = f"{''.ljust(10)} {admission['date'].ljust(12)} {''.ljust(25)} {admission['upper'].ljust(10)} {admission['colon'].ljust(10)}"
-
-                    print(result_string)
-                    file.write(result_string + "\n")
-                print()
-                repeat_patients += 1
-                file.write("\n\n")
+                print(result_string)
+                file.write(result_string + "\n")
+            print()
+            file.write("\n\n")
         file.write("\n")
-        file.write(f"Number of repeats: {repeat_patients}\n")
+        file.write(f"Number of repeats: {patients}\n")
+        file.write(f"Number of repeat admission pairs: {len(repeats)}\n")
         file.write(f"Total number of procedures: {total_procedures}")
-    print(f"Number of repeats: {repeat_patients}\n")
+    print(f"Number of repeats: {patients}")
+    print(f"Number of repeat admission pairs: {len(repeats)}\n")
     print(f"Total number of procedures: {total_procedures}")
+
+
+def report_window(start, end, csv_path=csv_file, report_path=text_file, title=None):
+    """Report repeat procedures whose second admission falls between start and end."""
+    mrn_to_episodes, total_procedures = collect_admissions(csv_path, start, end)
+    repeats = find_repeats(mrn_to_episodes, start.toordinal())
+    if title is None:
+        title = (
+            f"QPS REPORT ON REPEAT PROCEDUES FROM {start.strftime('%d-%m-%Y')} "
+            f"TO {end.strftime('%d-%m-%Y')}"
+        )
+    write_report(title, repeats, total_procedures, report_path)
+    return repeats, total_procedures
+
+
+def main(year, month, csv_path=csv_file, report_path=text_file):  # year is str, month is int
+    """First - read day_surgery.csv once for admissions in the quarter and the
+    31 days before it, building a dictionary mapping mrn to a list of admissions
+    and counting the procedures done in the quarter.
+    Second - sort each patient's (mrn's) admissions by day and slide a 31 day
+    window along them to find every pair of admissions within 31 days whose
+    second admission was in the quarter.
+    Third - wrie those patient's data to a report file"""
+    start, end = quarter_window(year, month)
+    title = f"QPS REPORT ON REPEAT PROCEDUES IN THE 3 MONTHS UP TO {str(month)}/{year}"
+    report_window(start, end, csv_path, report_path, title)
     # os.startfile(text_file)
     # uncomment this on deployment on windows
 
@@ -0,0 +1,126 @@
+import csv
+from datetime import date
+
+from repeat_procedures import (
+    collect_admissions,
+    find_repeats,
+    headers,
+    pairs_within,
+    quarter_window,
+    repeat_patients,
+    write_report,
+)
+
+
+# Helper to write a small day_surgery.csv (no header row) for testing
+def write_test_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        for row in rows:
+            # Fill missing fields with empty strings
+            full_row = {field: "" for field in headers}
+            full_row.update(row)
+            writer.writerow(full_row)
+
+
+def repeats_for_quarter(csv_file, year, month):
+    start, end = quarter_window(year, month)
+    mrn_to_episodes, total = collect_admissions(str(csv_file), start, end)
+    return find_repeats(mrn_to_episodes, start.toordinal()), total
+
+
+def test_pairs_within_window():
+    """Every pair less than 31 days apart, not just neighbours."""
+    days = [0, 10, 20, 45]
+    assert list(pairs_within(days)) == [(0, 1), (0, 2), (1, 2), (2, 3)]
+
+
+def test_quarter_window():
+    assert quarter_window("2025", 3) == (date(2025, 1, 1), date(2025, 3, 31))
+    assert quarter_window("2024", 12) == (date(2024, 10, 1), date(2024, 12, 31))
+
+
+def test_third_admission_in_window(tmp_path):
+    """Three admissions within 31 days are three pairs but one patient."""
+    csv_file = tmp_path / "day_surgery.csv"
+    write_test_csv(csv_file, [
+        {"date": "03-02-2025", "mrn": "100", "endoscopist": "Dr A", "colon": "32090"},
+        {"date": "10-02-2025", "mrn": "100", "endoscopist": "Dr A", "colon": "32090"},
+        {"date": "20-02-2025", "mrn": "100", "endoscopist": "Dr B", "colon": "32090"},
+    ])
+    repeats, total = repeats_for_quarter(csv_file, "2025", 3)
+    assert [(first["date"], second["date"]) for first, second in repeats] == [
+        ("03-02-2025", "10-02-2025"),
+        ("03-02-2025", "20-02-2025"),
+        ("10-02-2025", "20-02-2025"),
+    ]
+    assert repeat_patients(repeats) == 1
+    assert total == 3
+
+
+def test_same_day_duplicates_are_not_repeats(tmp_path):
+    """day_surgery.csv has duplicate rows - they are one admission, not a repeat."""
+    csv_file = tmp_path / "day_surgery.csv"
+    row = {"date": "03-02-2025", "mrn": "100", "endoscopist": "Dr A", "upper": "30473"}
+    write_test_csv(csv_file, [row, row])
+    repeats, total = repeats_for_quarter(csv_file, "2025", 3)
+    assert repeats == []
+
+
+def test_year_end_look_back(tmp_path):
+    """A March quarter looks back into December of the year before."""
+    csv_file = tmp_path / "day_surgery.csv"
+    write_test_csv(csv_file, [
+        {"date": "20-12-2024", "mrn": "100", "endoscopist": "Dr A", "colon": "32090"},
+        {"date": "10-01-2025", "mrn": "100", "endoscopist": "Dr A", "colon": "32090"},
+        {"date": "15-11-2024", "mrn": "200", "endoscopist": "Dr A", "colon": "32090"},
+        {"date": "14-12-2024", "mrn": "200", "endoscopist": "Dr A", "colon": "32090"},
+    ])
+    repeats, total = repeats_for_quarter(csv_file, "2025", 3)
+    # mrn 200's second admission is before the quarter, so only mrn 100 counts
+    assert [(first["mrn"], first["date"], second["date"]) for first, second in repeats] == [
+        ("100", "20-12-2024", "10-01-2025"),
+    ]
+    # Only procedures inside the quarter are in the total
+    assert total == 1
+
+
+def test_split_procedure_is_not_a_repeat(tmp_path):
+    """An upper one day and a colonoscopy the next is a planned split."""
+    csv_file = tmp_path / "day_surgery.csv"
+    write_test_csv(csv_file, [
+        {"date": "03-02-2025", "mrn": "100", "endoscopist": "Dr A", "upper": "30473"},
+        {"date": "04-02-2025", "mrn": "100", "endoscopist": "Dr A", "colon": "32090"},
+    ])
+    repeats, total = repeats_for_quarter(csv_file, "2025", 3)
+    assert repeats == []
+
+
+def test_report_counts_patients_and_pairs(tmp_path):
+    first = {"mrn": "100", "date": "03-02-2025", "endoscopist": "Dr A", "upper": "", "colon": "short colon"}
+    second = dict(first, date="10-02-2025")
+    third = dict(first, date="20-02-2025")
+    report = tmp_path / "repeats.txt"
+    write_report("TITLE", [(first, second), (first, third), (second, third)], 3, report)
+    text = report.read_text()
+    assert "Number of repeats: 1\n" in text
+    assert "Number of repeat admission pairs: 3\n" in text
+
+
+def test_index_procedures_match_quarterly_total(tmp_path):
+    """The MRN index counts duplicate rows' procedures as the QPS total does."""
+    from mrn_index import MrnIndex
+
+    csv_file = tmp_path / "day_surgery.csv"
+    row = {"date": "03-02-2025", "mrn": "100", "endoscopist": "Dr A", "upper": "30473", "colon": "32090"}
+    write_test_csv(csv_file, [
+        row,
+        row,
+        {"date": "10-03-2025", "mrn": "200", "endoscopist": "Dr A", "colon": "32090"},
+    ])
+    repeats, total = repeats_for_quarter(csv_file, "2025", 3)
+    index = MrnIndex.load(str(tmp_path / "mrn_index.json"), str(csv_file))
+    start, end = quarter_window("2025", 3)
+    assert index.procedures(start, end) == {("Dr A", "2025 Q1"): total}
+    assert total == 5
+    assert list(index.repeats(start, end)) == []
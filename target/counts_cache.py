@@ -0,0 +1,105 @@
+"""Patient counts per year and per week for the Tillett sedation csv files.
+
+Tillett_master.csv only changes at rollover, so its counts are saved in a
+json file beside it, keyed by its size and modification time, and it is only
+reread when one of those changes. Tillett.csv (the current, small file) is
+counted fresh every time.
+
+Weeks are numbered from 1 January: days 1-7 are week 0, and so on.
+"""
+import csv
+import json
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dec_dates import day_ordinal  # noqa: E402
+
+WEEKS_IN_YEAR = 53
+
+
+def empty_counts():
+    return {"years": {}, "weeks": {}}
+
+
+def week_of_year(d):
+    return (d.timetuple().tm_yday - 1) // 7
+
+
+def count_file(path):
+    """Count the rows of a Tillett csv file by year and by week."""
+    counts = empty_counts()
+    with open(path) as h:
+        reader = csv.reader(h)
+        for ep in reader:
+            if not ep:
+                continue
+            # Year from the end of the date, as the target has always counted
+            year = ep[0].split("-")[-1]
+            counts["years"][year] = counts["years"].get(year, 0) + 1
+            try:
+                d = date.fromordinal(day_ordinal(ep[0]))
+            except ValueError:
+                continue
+            weeks = counts["weeks"].setdefault(str(d.year), [0] * WEEKS_IN_YEAR)
+            weeks[week_of_year(d)] += 1
+    return counts
+
+
+def file_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def cached_counts(path, cache_path):
+    """Counts for a file that rarely changes, from cache_path when still valid."""
+    key = file_key(path)
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache["key"] == key:
+            return cache["counts"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    counts = count_file(path)
+    try:
+        with open(cache_path, "w") as f:
+            json.dump({"key": key, "counts": counts}, f)
+    except OSError:
+        pass  # read-only folder - just count again next time
+    return counts
+
+
+def merge_counts(*all_counts):
+    merged = empty_counts()
+    for counts in all_counts:
+        for year, n in counts["years"].items():
+            merged["years"][year] = merged["years"].get(year, 0) + n
+        for year, weeks in counts["weeks"].items():
+            total = merged["weeks"].setdefault(year, [0] * WEEKS_IN_YEAR)
+            for i, n in enumerate(weeks):
+                total[i] += n
+    return merged
+
+
+def all_counts(master_path, current_path, cache_path):
+    """Cached master counts plus a fresh count of the current file (if it exists)."""
+    master = cached_counts(master_path, cache_path)
+    try:
+        current = count_file(current_path)
+    except FileNotFoundError:
+        current = empty_counts()
+    return merge_counts(master, current)
+
+
+def year_total(counts, year):
+    return counts["years"].get(str(year), 0)
+
+
+def weekly_series(counts, year):
+    """Patients per week of the year, week 0 first."""
+    return list(counts["weeks"].get(str(year), [0] * WEEKS_IN_YEAR))
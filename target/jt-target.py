@@ -4,15 +4,25 @@ Created on Thu Sep 13 08:36:36 2018
 @author: John Tillett
 Return whether on weekly target from first_date.
 Count entries in master and current csv files.
+The master file's counts are cached (see counts_cache.py).
+Targets and the year-end projection use working days (see projection.py).
 """
-import csv
 import datetime
 import math
 
 import pyautogui as pya
 import colorama
+
+from counts_cache import all_counts, weekly_series, week_of_year, year_total
+from projection import load_calendar, project, projection_lines
+
 colorama.init()
 
+MASTER_FILE = r"d:\JOHN TILLET\episode_data\sedation\Tillett_master.csv"
+CURRENT_FILE = r"d:\JOHN TILLET\episode_data\sedation\Tillett.csv"
+MASTER_CACHE = r"d:\JOHN TILLET\episode_data\sedation\Tillett_master_counts.json"
+RECENT_WEEKS = 8
+
 
 def clear():
     print("\033[2J")  # clear screen
@@ -24,30 +34,16 @@ FIRST_DATE = datetime.datetime(int(YEAR), 1, 1)
 
 carry_over = 320
 today = datetime.datetime.now()
-this_year_number = 0
-
-with open("d:\JOHN TILLET\episode_data\sedation\Tillett_master.csv") as h:
-    reader = csv.reader(h)
-    for ep in reader:
-        if ep[0].split("-")[-1] == YEAR:
-            this_year_number += 1
-try:
-    with open("d:\JOHN TILLET\episode_data\sedation\Tillett.csv") as h:
-        reader = csv.reader(h)
-        for ep in reader:
-            if ep[0].split("-")[-1] == YEAR:
-                this_year_number += 1
-except FileNotFoundError:
-    this_year_number += 0
-#    print("Tillett.csv not found. Try again after doing a patient.")
-#    input("Press any key to exit")
-#    sys.exit(0)
+
+counts = all_counts(MASTER_FILE, CURRENT_FILE, MASTER_CACHE)
+this_year_number = year_total(counts, YEAR)
 
 
 total_plus_carryover = this_year_number + carry_over
 a = today - FIRST_DATE
 days_diff = a.days
-desired_number = int(days_diff * int(DESIRED_WEEKLY) / 7)
+projection = project(counts, today.date(), int(DESIRED_WEEKLY), load_calendar())
+desired_number = int(projection["target_so_far"])
 excess = this_year_number - desired_number
 av_so_far = this_year_number * 7 / days_diff
 clear()
@@ -55,4 +51,15 @@ print("Patients this year: {}\n".format(this_year_number))
 print("Patients this year plus carry over from last year : {}\n".format(total_plus_carryover))
 print("Excess for {} - without carry over: {}\n".format(DESIRED_WEEKLY, excess))
 print("Average per week - without carry over: ", math.floor(av_so_far))
+print()
+for line in projection_lines(projection, DESIRED_WEEKLY):
+    print(line)
+
+# Recent complete weeks against the target
+this_week = week_of_year(today.date())
+weeks = weekly_series(counts, YEAR)
+print("\nRecent weeks (target {}):".format(DESIRED_WEEKLY))
+for week in range(max(0, this_week - RECENT_WEEKS), this_week):
+    week_start = FIRST_DATE + datetime.timedelta(days=7 * week)
+    print("  {}  {:>3}  {}".format(week_start.strftime("%d-%m"), weeks[week], "#" * weeks[week]))
 input()
@@ -0,0 +1,138 @@
+"""Year-end projection for the weekly patient target.
+
+Works from the cached weekly counts in counts_cache.py, so nothing is rescanned.
+Rates are per working day, using the calendar in config.ini beside this file:
+
+    [calendar]
+    working_days = Mon Tue Wed Thu Fri
+    holidays = 01-01-2025, 27-01-2025, 18-04-2025
+
+    [projection]
+    trailing_weeks = 8
+
+Everything is optional - without config.ini it is Monday to Friday, no
+holidays and an 8 week trailing window. The weekly target is for a full
+working week, so a week with a holiday in it is expected to be lighter.
+"""
+import configparser
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from counts_cache import week_of_year, weekly_series, year_total  # noqa: E402
+from dec_dates import day_ordinal  # noqa: E402
+
+CONFIG_FILE = Path(__file__).resolve().parent / "config.ini"
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+TRAILING_WEEKS = 8
+
+
+def load_calendar(path=CONFIG_FILE):
+    """Working weekdays (0 = Monday), holiday day numbers and trailing window."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    calendar = config["calendar"] if config.has_section("calendar") else {}
+    names = calendar.get("working_days", "Mon Tue Wed Thu Fri").split()
+    holidays = calendar.get("holidays", "").replace(",", " ").split()
+    return {
+        "weekdays": {WEEKDAYS.index(name.title()[:3]) for name in names},
+        "holidays": {day_ordinal(holiday) for holiday in holidays},
+        "trailing_weeks": config.getint(
+            "projection", "trailing_weeks", fallback=TRAILING_WEEKS
+        ),
+    }
+
+
+def working_days(start, end, calendar):
+    """Working days from start to end (dates) inclusive."""
+    if end < start:
+        return 0
+    total_days = (end - start).days + 1
+    full_weeks, extra = divmod(total_days, 7)
+    count = full_weeks * len(calendar["weekdays"])
+    first_weekday = start.weekday()
+    for i in range(extra):
+        if (first_weekday + i) % 7 in calendar["weekdays"]:
+            count += 1
+    for holiday in calendar["holidays"]:
+        if start.toordinal() <= holiday <= end.toordinal():
+            if date.fromordinal(holiday).weekday() in calendar["weekdays"]:
+                count -= 1
+    return count
+
+
+def trailing_rate(weeks, year, this_week, calendar):
+    """Patients per working day over the complete weeks in the trailing window.
+
+    Returns None before the first week of the year is complete.
+    """
+    first_week = max(0, this_week - calendar["trailing_weeks"])
+    if first_week == this_week:
+        return None
+    jan_1 = date(year, 1, 1)
+    start = jan_1 + timedelta(days=7 * first_week)
+    end = jan_1 + timedelta(days=7 * this_week - 1)
+    days = working_days(start, end, calendar)
+    if not days:
+        return None
+    return sum(weeks[first_week:this_week]) / days
+
+
+def project(counts, today, weekly_target, calendar):
+    """Projection for today's year as a dict.
+
+    done            patients so far this year
+    target_so_far   where the target says we should be by today
+    year_target     the weekly target spread over the year's working days
+    rate            patients per working day (trailing window, or the year
+                    to date if no week is complete yet)
+    projected       done + rate x the working days left
+    required_weekly patients a week needed for the rest of the year to
+                    reach year_target
+    """
+    year = today.year
+    days_per_week = len(calendar["weekdays"])
+    jan_1, dec_31 = date(year, 1, 1), date(year, 12, 31)
+    done = year_total(counts, year)
+
+    days_so_far = working_days(jan_1, today, calendar)
+    days_left = working_days(today + timedelta(days=1), dec_31, calendar)
+    year_days = days_so_far + days_left
+
+    rate = trailing_rate(weekly_series(counts, year), year, week_of_year(today), calendar)
+    if rate is None:
+        rate = done / days_so_far if days_so_far else 0.0
+
+    year_target = weekly_target * year_days / days_per_week
+    if days_left:
+        required_weekly = max(0.0, year_target - done) / days_left * days_per_week
+    else:
+        required_weekly = 0.0
+
+    return {
+        "done": done,
+        "target_so_far": weekly_target * days_so_far / days_per_week,
+        "year_target": year_target,
+        "rate": rate,
+        "projected": done + rate * days_left,
+        "required_weekly": required_weekly,
+        "days_left": days_left,
+        "days_per_week": days_per_week,
+    }
+
+
+def projection_lines(projection, weekly_target):
+    days_per_week = projection["days_per_week"]
+    return [
+        "Target to date: {:.0f}".format(projection["target_so_far"]),
+        "Year target at {} a week: {:.0f}".format(weekly_target, projection["year_target"]),
+        "Current rate: {:.1f} a day ({:.1f} a {} day week)".format(
+            projection["rate"], projection["rate"] * days_per_week, days_per_week
+        ),
+        "Projected year end: {:.0f}".format(projection["projected"]),
+        "Needed from now on: {:.1f} a week over {} working days".format(
+            projection["required_weekly"], projection["days_left"]
+        ),
+    ]
@@ -0,0 +1,198 @@
+"""
+Procedure durations from the in and out theatre times in episodes.csv.
+
+Durations are counted in whole minutes in a count cube (see count_cube.py)
+by month, endoscopist and procedure type. Counts add together exactly, so
+the median, 90th and 99th percentiles and the number over 55 minutes for any
+run of months and any group of doctors come from the saved cube without
+rereading episodes.csv. The cube is saved in theatre_durations.json and kept
+up to date the same way as count_cube.json.
+
+A time out earlier than the time in is taken to be after midnight, but only
+up to MAX_MINUTES; beyond that it is a typing error and the row is skipped.
+
+    python durations.py 2025                 whole year
+    python durations.py 2024 2025 --months 7-12
+"""
+import argparse
+import math
+import platform
+import sys
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from count_cube import CountCube, month_range  # noqa: E402
+
+if platform.system() == "Windows":
+    episodes_file = r"D:\John TILLET\episode_data\episodes.csv"
+else:
+    episodes_file = "episodes.csv"
+durations_file = "theatre_durations.json"
+report_file = "theatre_durations.txt"
+
+LONG_CASE = 55  # minutes
+MINUTES_IN_DAY = 24 * 60
+MAX_MINUTES = 12 * 60  # longer than this is a typing error, not a procedure
+SKIPPED = "skipped"  # minutes label for rows without usable times
+DURATION_DIMS = ("year", "month", "endoscopist", "procedure", "minutes")
+
+
+def procedure_type(row):
+    """Describe the procedure from the upper/colon/anal columns.
+
+    The same labels as follow_up's analytics.procedure_type, copied because
+    follow_up runs on its own and is not imported from here.
+    """
+    parts = []
+    if row.get("upper", "").strip():
+        parts.append("upper")
+    if row.get("colon", "").strip():
+        parts.append("colon")
+    if row.get("anal", "").strip():
+        parts.append("banding")
+    return " + ".join(parts) or "other"
+
+
+@lru_cache(maxsize=2048)
+def minutes(time_string):
+    """HH:MM -> minutes since midnight. Raises ValueError for a bad time."""
+    hours, _, mins = time_string.strip().partition(":")
+    hours, mins = int(hours), int(mins)
+    if not (0 <= hours < 24 and 0 <= mins < 60):
+        raise ValueError(f"bad time {time_string!r}")
+    return hours * 60 + mins
+
+
+def duration(in_time, out_time):
+    """Minutes from in_time to out_time (HH:MM), past midnight if out is earlier.
+
+    Raises ValueError for a bad time or a duration over MAX_MINUTES.
+    """
+    taken = (minutes(out_time) - minutes(in_time)) % MINUTES_IN_DAY
+    if taken > MAX_MINUTES:
+        raise ValueError(f"{in_time} to {out_time} is over {MAX_MINUTES} minutes")
+    return taken
+
+
+class DurationHistogram:
+    """How many procedures took each whole number of minutes."""
+
+    def __init__(self, counts=None):
+        self.counts = counts or {}  # minutes -> procedures
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def over(self, limit=LONG_CASE):
+        return sum(n for minutes, n in self.counts.items() if minutes > limit)
+
+    def quantiles(self, qs):
+        """Duration at each fraction in qs (e.g. 0.5, 0.9), nearest rank.
+        None for an empty histogram."""
+        total = self.total()
+        if not total:
+            return [None for q in qs]
+        running = []
+        cumulative = 0
+        durations = sorted(self.counts)
+        for minutes in durations:
+            cumulative += self.counts[minutes]
+            running.append(cumulative)
+        return [durations[bisect_left(running, max(1, math.ceil(q * total)))] for q in qs]
+
+
+class TheatreDurations(CountCube):
+    """Procedures by (year, month, endoscopist, procedure type, minutes taken).
+
+    Rows without usable times are counted with minutes SKIPPED.
+    """
+
+    dims = DURATION_DIMS
+
+    @classmethod
+    def load(cls, cube_path=durations_file, csv_path=episodes_file):
+        return super().load(cube_path, csv_path)
+
+    def keys(self, row, d):
+        try:
+            taken = duration(row["in"], row["out"])
+        except (ValueError, AttributeError):
+            taken = SKIPPED
+        yield (d.year, d.month, row["endo"], procedure_type(row), taken)
+
+    def merged(self, years, months=range(1, 13), by=None):
+        """The durations in years x months.
+
+        by is None for one histogram, or "endoscopist" or "procedure" for
+        {label: histogram}.
+        """
+        where = {"year": years, "month": months}
+        if by is None:
+            counts = self.totals("minutes", **where)
+            counts.pop(SKIPPED, None)
+            return DurationHistogram(counts)
+        groups = {}
+        for (label, taken), n in self.totals((by, "minutes"), **where).items():
+            if taken != SKIPPED:
+                groups.setdefault(label, DurationHistogram()).counts[taken] = n
+        return groups
+
+    def skipped(self, years, months=range(1, 13)):
+        """Rows in years x months without usable times."""
+        return self.count(year=years, month=months, minutes=SKIPPED)
+
+
+def summary_line(label, histogram, limit=LONG_CASE):
+    total = histogram.total()
+    p50, p90, p99 = histogram.quantiles([0.5, 0.9, 0.99])
+    long_cases = histogram.over(limit)
+    percent = f"{long_cases / total * 100:.1f}%" if total else "-"
+    return (
+        f"{label.ljust(25)}{str(total).ljust(10)}{str(p50).ljust(8)}"
+        f"{str(p90).ljust(8)}{str(p99).ljust(8)}{str(long_cases).ljust(8)}{percent}"
+    )
+
+
+def report_lines(theatre, years, months=range(1, 13)):
+    header = (
+        "".ljust(25) + "Cases".ljust(10) + "p50".ljust(8) + "p90".ljust(8)
+        + "p99".ljust(8) + f"> {LONG_CASE}".ljust(8) + "%"
+    )
+    lines = [
+        f"PROCEDURE TIMES IN MINUTES {years[0]}-{years[-1]}, MONTHS {months[0]}-{months[-1]}",
+        "",
+        header,
+        summary_line("All", theatre.merged(years, months)),
+        "",
+        "BY ENDOSCOPIST",
+    ]
+    for doctor, histogram in sorted(theatre.merged(years, months, "endoscopist").items()):
+        lines.append(summary_line(doctor, histogram))
+    lines += ["", "BY PROCEDURE"]
+    for procedure, histogram in sorted(theatre.merged(years, months, "procedure").items()):
+        lines.append(summary_line(procedure, histogram))
+    lines += ["", f"Rows in these months without usable times: {theatre.skipped(years, months)}"]
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procedure times from episodes.csv")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int, nargs="?")
+    parser.add_argument("--months", type=month_range, default=range(1, 13), help="e.g. 7-12")
+    args = parser.parse_args(argv)
+
+    theatre = TheatreDurations.load()
+    years = range(args.first_year, (args.last_year or args.first_year) + 1)
+    lines = report_lines(theatre, years, args.months)
+    with open(report_file, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Theatre lists: start and finish times, turnover between patients and utilisation.
+
+Rows of episodes.csv (or day_surgery.csv) are grouped into sessions by (date,
+endoscopist). Each session's in/out intervals are sorted once and swept in
+order:
+    turnover  minutes from the latest out so far to the next patient's in
+    overlap   a patient in before the previous one is out - a data error
+    busy      minutes with a patient in theatre (overlaps counted once)
+Utilisation is busy minutes over the time from the first in to the last out.
+Sessions are analysed in a process pool, a batch of days per job.
+
+    python sessions.py 2025
+    python sessions.py 2023 2025 --source day_surgery --workers 4
+"""
+import argparse
+import csv
+import platform
+import statistics
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_filter import DAY_SURGERY_FIELDS  # noqa: E402
+from dec_dates import day_ordinal  # noqa: E402
+from durations import MINUTES_IN_DAY, duration, minutes  # noqa: E402
+
+if platform.system() == "Windows":
+    data_base = Path("d:/john tillet/episode_data/")
+else:
+    data_base = Path(".")
+
+# file, fieldnames (None = header row), in, out and endoscopist columns
+SOURCES = {
+    "episodes": (data_base / "episodes.csv", None, "in", "out", "endo"),
+    "day_surgery": (
+        data_base / "day_surgery.csv", DAY_SURGERY_FIELDS,
+        "in_theatre", "out_theatre", "endoscopist",
+    ),
+}
+report_file = "theatre_sessions.txt"
+sessions_file = "theatre_sessions.csv"
+
+DAYS_PER_JOB = 60
+session_headers = [
+    "date", "endoscopist", "cases", "start", "finish", "list_minutes",
+    "busy_minutes", "utilisation", "turnovers", "mean_turnover", "overlaps",
+]
+
+
+def read_sessions(source, first_year, last_year):
+    """{(day number, date, endoscopist): [(in, out, mrn)]} for the years given.
+
+    Times are minutes since midnight; an out before its in is taken to be
+    after midnight unless that makes the case implausibly long (see
+    durations.duration). Rows without usable times are counted in skipped.
+    day_surgery.csv has duplicate rows, so only the first row for each
+    (date, mrn) is used.
+    """
+    path, fieldnames, in_column, out_column, endo_column = SOURCES[source]
+    sessions = defaultdict(list)
+    seen = set()
+    skipped = 0
+    years = {str(year) for year in range(first_year, last_year + 1)}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f, fieldnames=fieldnames):
+            date_str = row["date"]
+            if date_str[-4:] not in years:
+                continue
+            if (date_str, row["mrn"]) in seen:
+                continue
+            seen.add((date_str, row["mrn"]))
+            try:
+                day = day_ordinal(date_str)
+                start = minutes(row[in_column])
+                end = start + duration(row[in_column], row[out_column])
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            sessions[(day, date_str, row[endo_column])].append((start, end, row["mrn"]))
+    return sessions, skipped
+
+
+def time_label(minutes_since_midnight):
+    hours, mins = divmod(minutes_since_midnight % MINUTES_IN_DAY, 60)
+    return f"{hours:02d}:{mins:02d}"
+
+
+def sweep(intervals):
+    """Turnover gaps, overlapping mrns and busy minutes for one session."""
+    intervals = sorted(intervals)
+    gaps = []
+    overlaps = []
+    busy = 0
+    latest_end = None
+    latest_mrn = None
+    for start, end, mrn in intervals:
+        if latest_end is None:
+            busy += end - start
+        elif start >= latest_end:
+            gaps.append(start - latest_end)
+            busy += end - start
+        else:
+            overlaps.append((latest_mrn, mrn))
+            busy += max(0, end - latest_end)
+        if latest_end is None or end > latest_end:
+            latest_end, latest_mrn = end, mrn
+    return gaps, overlaps, busy, intervals[0][0], latest_end
+
+
+def analyse_session(key, intervals):
+    day, date_str, endoscopist = key
+    gaps, overlaps, busy, start, finish = sweep(intervals)
+    list_minutes = finish - start
+    return {
+        "day": day,
+        "date": date_str,
+        "endoscopist": endoscopist,
+        "cases": len(intervals),
+        "start": start,
+        "finish": finish,
+        "list_minutes": list_minutes,
+        "busy_minutes": busy,
+        "gaps": gaps,
+        "overlaps": overlaps,
+    }
+
+
+def analyse_batch(batch):
+    """Analyse a list of (key, intervals) sessions - one process pool job."""
+    return [analyse_session(key, intervals) for key, intervals in batch]
+
+
+def analyse_all(sessions, workers=None):
+    """Analyse every session, DAYS_PER_JOB days to a job. Sorted by date then doctor."""
+    by_day = defaultdict(list)
+    for key, intervals in sessions.items():
+        by_day[key[0]].append((key, intervals))
+    days = sorted(by_day)
+    batches = [
+        [session for day in days[i:i + DAYS_PER_JOB] for session in by_day[day]]
+        for i in range(0, len(days), DAYS_PER_JOB)
+    ]
+    if workers == 1 or len(batches) < 2:
+        results = map(analyse_batch, batches)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyse_batch, batches))
+    analysed = [session for batch in results for session in batch]
+    analysed.sort(key=lambda s: (s["day"], s["endoscopist"]))
+    return analysed
+
+
+def utilisation(session):
+    if not session["list_minutes"]:
+        return 1.0
+    return session["busy_minutes"] / session["list_minutes"]
+
+
+def write_sessions(analysed, path=sessions_file):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(session_headers)
+        for s in analysed:
+            gaps = s["gaps"]
+            writer.writerow([
+                s["date"], s["endoscopist"], s["cases"],
+                time_label(s["start"]), time_label(s["finish"]),
+                s["list_minutes"], s["busy_minutes"], f"{utilisation(s):.2f}",
+                len(gaps), f"{sum(gaps) / len(gaps):.1f}" if gaps else "",
+                len(s["overlaps"]),
+            ])
+
+
+def report_lines(analysed, first_year, last_year, skipped):
+    by_doctor = defaultdict(list)
+    for s in analysed:
+        by_doctor[s["endoscopist"]].append(s)
+
+    lines = [
+        f"THEATRE SESSIONS {first_year}-{last_year}",
+        "",
+        "Doctor".ljust(25) + "Lists".ljust(8) + "Cases".ljust(8) + "Start".ljust(8)
+        + "Finish".ljust(8) + "Turnover".ljust(10) + "Use".ljust(8) + "Overlaps",
+    ]
+    for doctor in sorted(by_doctor):
+        sessions = by_doctor[doctor]
+        gaps = [gap for s in sessions for gap in s["gaps"]]
+        lines.append(
+            doctor.ljust(25)
+            + str(len(sessions)).ljust(8)
+            + str(sum(s["cases"] for s in sessions)).ljust(8)
+            + time_label(int(statistics.median(s["start"] for s in sessions))).ljust(8)
+            + time_label(int(statistics.median(s["finish"] for s in sessions))).ljust(8)
+            + (f"{statistics.median(gaps):.0f} min" if gaps else "-").ljust(10)
+            + f"{statistics.mean(utilisation(s) for s in sessions) * 100:.0f}%".ljust(8)
+            + str(sum(len(s["overlaps"]) for s in sessions))
+        )
+    lines += [
+        "",
+        "Start, finish and turnover are medians; use is busy time over list time.",
+        f"Rows without usable times: {skipped}",
+        "",
+        "OVERLAPS (patient in before the previous one was out)",
+    ]
+    for s in analysed:
+        for earlier, later in s["overlaps"]:
+            lines.append(f"{s['date']}  {s['endoscopist'].ljust(25)}{earlier} / {later}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Theatre list turnover and utilisation")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int, nargs="?")
+    parser.add_argument("--source", choices=SOURCES, default="episodes")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use")
+    args = parser.parse_args(argv)
+    last_year = args.last_year or args.first_year
+
+    sessions, skipped = read_sessions(args.source, args.first_year, last_year)
+    analysed = analyse_all(sessions, args.workers)
+    write_sessions(analysed)
+    lines = report_lines(analysed, args.first_year, last_year, skipped)
+    with open(report_file, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    print(f"{len(analysed)} sessions - report written to {report_file}, details to {sessions_file}")
+
+
+if __name__ == "__main__":
+    main()
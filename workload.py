@@ -0,0 +1,79 @@
+"""Procedures by anaesthetist, endoscopist, weekday and month, for rosters.
+
+A count cube of every episodes.csv row, kept in workload.json and brought up
+to date with appended rows each run (see count_cube.py), so any slice is
+answered without rereading episodes.csv:
+
+    python workload.py 2025 --by anaesthetist                yearly totals
+    python workload.py 2025 --endo "Dr X" --weekday Tue --anaes "Dr Y"
+    python workload.py 2023 2025 --endo "Dr X" --by weekday
+    python workload.py 2025 --months 1-6 --pairs             anaesthetist/endoscopist pairs
+"""
+import argparse
+
+from count_cube import CountCube, episodes_file, month_range
+
+workload_file = "workload.json"
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+WORKLOAD_DIMS = ("year", "month", "weekday", "anaesthetist", "endoscopist")
+
+
+class WorkloadCube(CountCube):
+    """One count per episode, by (year, month, weekday, anaesthetist, endoscopist)."""
+
+    dims = WORKLOAD_DIMS
+
+    def keys(self, row, d):
+        yield (d.year, d.month, WEEKDAYS[d.weekday()], row["anaes"].strip(), row["endo"].strip())
+
+    def pairs(self, **where):
+        """{(anaesthetist, endoscopist): procedures} for the cells matching where."""
+        return self.totals(("anaesthetist", "endoscopist"), **where)
+
+
+def name(label):
+    return label or "(none)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anaesthetist and endoscopist workload")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int, nargs="?")
+    parser.add_argument("--months", type=month_range, help="e.g. 7-12")
+    parser.add_argument("--weekday", nargs="+", choices=WEEKDAYS)
+    parser.add_argument("--anaes")
+    parser.add_argument("--endo")
+    parser.add_argument("--by", choices=["year", "month", "weekday", "anaesthetist", "endoscopist"])
+    parser.add_argument("--pairs", action="store_true", help="totals per anaesthetist/endoscopist pair")
+    args = parser.parse_args(argv)
+
+    workload = WorkloadCube.load(workload_file, episodes_file)
+    where = {
+        "year": range(args.first_year, (args.last_year or args.first_year) + 1),
+        "month": args.months,
+        "weekday": args.weekday,
+        "anaesthetist": args.anaes,
+        "endoscopist": args.endo,
+    }
+    if args.pairs:
+        pairs = workload.pairs(**where)
+        for (anaes, endo), count in sorted(pairs.items(), key=lambda item: -item[1]):
+            print(f"{name(anaes):<20} {name(endo):<20} {count}")
+    elif args.by:
+        totals = workload.totals(args.by, **where)
+        if args.by == "weekday":
+            order = [day for day in WEEKDAYS if day in totals]
+        elif args.by in ("year", "month"):
+            order = sorted(totals)
+        else:
+            order = sorted(totals, key=totals.get, reverse=True)
+        for label in order:
+            print(f"{name(str(label)):<20} {totals[label]}")
+        print(f"{'Total':<20} {sum(totals.values())}")
+    else:
+        print(workload.count(**where))
+
+
+if __name__ == "__main__":
+    main()